@@ -0,0 +1,84 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+# Function to parse user-supplied prefix weights such as "/blog=2, /tag=0.5"
+def parse_prefix_weights(text):
+    weights = {}
+    for item in (text or '').split(','):
+        if '=' in item:
+            prefix, weight = item.split('=', 1)
+            weights[prefix.strip()] = float(weight)
+    return weights
+
+
+# Orders audits by value and stops handing out work once the audit budget is spent
+class AuditScheduler:
+    def __init__(self, prefix_weights=None, max_calls=None, max_seconds=None,
+                 depth_weight=1.0, inlink_weight=1.0):
+        # Longest prefix wins, so "/blog/tag" can override "/blog"
+        self.prefix_weights = sorted((prefix_weights or {}).items(), key=lambda item: -len(item[0]))
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.depth_weight = depth_weight
+        self.inlink_weight = inlink_weight
+        self._heap = []
+        self._counter = itertools.count()
+        self.calls_started = 0
+
+    def prefix_weight(self, url):
+        path = urlparse(url).path or '/'
+        for prefix, weight in self.prefix_weights:
+            if url.startswith(prefix) or path.startswith(prefix):
+                return weight
+        return 1.0
+
+    # Function to score a page: shallow and well-linked pages first, scaled by prefix weight
+    def priority(self, url, depth=None, inlinks=0):
+        depth_score = 1.0 / (1 + depth) if depth is not None else 0.0
+        inlink_score = math.log1p(inlinks)
+        return self.prefix_weight(url) * (self.depth_weight * depth_score + self.inlink_weight * inlink_score)
+
+    def add(self, url, depth=None, inlinks=0):
+        score = self.priority(url, depth, inlinks)
+        heapq.heappush(self._heap, (-score, next(self._counter), url))
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _budget_left(self, deadline):
+        if self.max_calls is not None and self.calls_started >= self.max_calls:
+            return False
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        return True
+
+    # Function to audit URLs highest-priority first until the queue or the budget runs out
+    async def run(self, audit, concurrency=10):
+        deadline = time.monotonic() + self.max_seconds if self.max_seconds else None
+        results = []
+
+        async def worker():
+            while self._heap and self._budget_left(deadline):
+                neg_score, _, url = heapq.heappop(self._heap)
+                self.calls_started += 1
+                result = await audit(url)
+                result['Priority'] = round(-neg_score, 3)
+                results.append(result)
+
+        # In-flight audits are allowed to finish after the deadline; no new ones start
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        skipped = [{'URL': url, 'Priority': round(-neg_score, 3), 'Status': 'Skipped (audit budget)'}
+                   for neg_score, _, url in sorted(self._heap)]
+        self._heap.clear()
+        if skipped:
+            logger.info(f"Audit budget exhausted: {len(results)} audited, {len(skipped)} skipped")
+        return results + skipped
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from urllib.parse import urlparse
+
+from excel_export import save_rows
+from http_client import get_client, close_client
+from pagespeed_client import PageSpeedClient, parse_api_keys
+from redirects import RedirectResolver
+from retry_policy import get_policy
+from structured_logging import setup_logging
+from url import run_site, SITE_DEFAULTS
+
+logger = logging.getLogger(__name__)
+
+# Example config:
+# {
+#   "max_concurrent_sites": 4,
+#   "pagespeed_concurrency": 10,
+#   "output_root": "outputs",
+#   "defaults": {"api_key": "key1,key2", "max_pages": 5000, "crawl_minutes": 30, "exclude": ["/blog/tag/"]},
+#   "sites": [
+#     {"url": "https://www.xenonstack.com/", "per_template": 3, "prefix_weights": {"/blog": 2}},
+#     {"url": "https://www.example.com/", "max_depth": 4, "known_urls": ["https://www.example.com/landing"]}
+#   ]
+# }
+
+
+# Function to read the batch config file
+def load_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not config.get('sites'):
+        raise ValueError(f"{path} does not list any sites")
+    return config
+
+
+# Function to merge defaults and per-site settings into the form run_site expects
+def site_settings(config, site):
+    settings = dict(SITE_DEFAULTS)
+    settings.update(config.get('defaults', {}))
+    settings.update({key: value for key, value in site.items() if key != 'url'})
+    settings['api_key'] = settings['api_key'] or os.environ.get('PAGESPEED_API_KEY')
+    settings['include'] = [re.compile(pattern) for pattern in settings['include']]
+    settings['exclude'] = [re.compile(pattern) for pattern in settings['exclude']]
+    if settings['output_dir'] == SITE_DEFAULTS['output_dir']:
+        settings['output_dir'] = os.path.join(config.get('output_root', 'outputs'), urlparse(site['url']).netloc)
+    return settings
+
+
+# Function to run every configured site in one process, sharing pools, rate limits and caches
+async def run_batch(config):
+    site_semaphore = asyncio.Semaphore(config.get('max_concurrent_sites', 4))
+    semaphore_pagespeed = asyncio.Semaphore(config.get('pagespeed_concurrency', 10))
+    resolver = RedirectResolver()
+    pagespeed_clients = {}  # one client per key set, so per-key quotas are tracked across sites
+
+    def pagespeed_for(settings):
+        keys = tuple(parse_api_keys(settings['api_key']))
+        if keys not in pagespeed_clients:
+            pagespeed_clients[keys] = PageSpeedClient(keys, semaphore=semaphore_pagespeed)
+        return pagespeed_clients[keys]
+
+    async def run_one(site):
+        async with site_semaphore:
+            try:
+                settings = site_settings(config, site)
+                return await run_site(site['url'], settings, semaphore_pagespeed=semaphore_pagespeed,
+                                      resolver=resolver, pagespeed=pagespeed_for(settings))
+            except Exception as e:
+                logger.exception(f"Site {site['url']} failed: {e}")
+                return {'Site': site['url'], 'Error': str(e)}
+
+    try:
+        summaries = await asyncio.gather(*(run_one(site) for site in config['sites']))
+    finally:
+        logger.info(f"HTTP pool stats: {get_client().pool_stats()}")
+        logger.info(f"Retry policy: {get_policy().summary()}")
+        for pagespeed in pagespeed_clients.values():
+            logger.info(f"PageSpeed key usage: {pagespeed.keys.stats()}")
+        await close_client()
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl, 404-check and audit many sites from one config file.")
+    parser.add_argument('config', help="path to the JSON batch config")
+    parser.add_argument('--summary', default='batch_summary.xlsx', help="where to write the per-site summary")
+    args = parser.parse_args()
+
+    setup_logging()
+    config = load_config(args.config)
+    summaries = asyncio.run(run_batch(config))
+    save_rows(args.summary, summaries)
+    print(f"Batch finished for {len(summaries)} sites; summary saved to {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# Single entry point for the crawl, 404-check and audit tools:
+#   python cli.py check urls.xlsx -o statuses.xlsx
+#   python cli.py site https://www.example.com/ --api-key KEY --max-pages 5000
+#   python cli.py batch sites.json
+#   python cli.py reports serve
+#   python cli.py history regressions --site https://www.example.com/
+#   python cli.py bench-imports --budget-ms 300
+# Only argparse is imported up front; each subcommand imports what it needs when it runs,
+# so a status check never loads selenium, pandas or bs4.
+import argparse
+import os
+import sys
+
+# Modules each subcommand imports; bench-imports times these in a fresh interpreter
+COMMAND_MODULES = {
+    'check': ['status_checker'],
+    'site': ['url'],
+    'batch': ['batch_runner'],
+    'reports': ['report_store'],
+    'history': ['history_store'],
+}
+
+
+# Function to read URLs from an .xlsx 'URL' column or a text file with one URL per line
+def read_urls(path):
+    if path.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value).strip() if value else '' for value in next(rows, ())]
+        if 'URL' not in header:
+            raise SystemExit(f"{path} does not contain a column named 'URL'")
+        column = header.index('URL')
+        urls = [row[column] for row in rows if len(row) > column and row[column]]
+        workbook.close()
+        return urls
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_check(args):
+    from status_checker import check_urls
+
+    urls = read_urls(args.input)
+    statuses = check_urls(urls, concurrency=args.concurrency, per_host=args.per_host)
+    rows = ({'URL': url, 'Status': status} for url, status in statuses.items())
+    if args.output.endswith('.xlsx'):
+        from excel_export import save_rows
+        save_rows(args.output, rows, columns=['URL', 'Status'])
+    else:
+        import csv
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['URL', 'Status'])
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"Checked {len(statuses)} URLs; results written to {args.output}")
+
+
+def run_site_command(args):
+    import asyncio
+    from url import run_site, SITE_DEFAULTS, parse_prefix_weights, parse_quotas, parse_patterns
+    from http_client import get_client, close_client
+    from retry_policy import get_policy
+
+    settings = dict(SITE_DEFAULTS, api_key=args.api_key or os.environ.get('PAGESPEED_API_KEY'), strategy=args.strategy, output_dir=args.output_dir,
+                    prefix_weights=parse_prefix_weights(args.prefix_weights), max_audits=args.max_audits,
+                    audit_minutes=args.audit_minutes, per_template=args.per_template,
+                    max_depth=args.max_depth, max_pages=args.max_pages, crawl_minutes=args.crawl_minutes,
+                    prefix_quotas=parse_quotas(args.quotas), include=parse_patterns(args.include),
+                    exclude=parse_patterns(args.exclude),
+                    dedupe_distance=None if args.no_dedupe else args.dedupe_distance,
+                    known_urls=read_urls(args.known_urls) if args.known_urls else None)
+
+    async def run():
+        try:
+            return await run_site(args.url, settings)
+        finally:
+            # close_client() drops the shared client, so read its stats first
+            print(f"HTTP pool stats: {get_client().pool_stats()}")
+            print(f"Retry policy: {get_policy().summary()}")
+            await close_client()
+
+    print(asyncio.run(run()))
+
+
+def run_batch_command(args):
+    import asyncio
+    from batch_runner import load_config, run_batch
+    from excel_export import save_rows
+
+    summaries = asyncio.run(run_batch(load_config(args.config)))
+    save_rows(args.summary, summaries)
+    print(f"Batch finished for {len(summaries)} sites; summary saved to {args.summary}")
+
+
+def run_reports(args):
+    from report_store import ReportStore, serve
+
+    store = ReportStore(args.root)
+    if args.action == 'serve':
+        serve(store, args.port)
+    elif args.action == 'evict':
+        print(f"Removed {store.evict(args.max_age_days, args.keep_runs)} unreferenced blobs")
+    else:
+        print(store.disk_usage())
+
+
+# Function to export the regression report or a percentile trend from the audit history
+def run_history(args):
+    from history_store import HistoryStore, regressions, percentile_trend, sheet_column, BASELINE_RUNS
+    from excel_export import ExcelWorkbook
+
+    store = HistoryStore(args.db)
+    try:
+        if args.action == 'regressions':
+            frame = regressions(store.load(site=args.site, strategy=args.strategy, last_runs=BASELINE_RUNS + 1))
+        else:
+            frame = percentile_trend(store.load(site=args.site, strategy=args.strategy, since=args.since,
+                                                metrics=[args.metric], with_urls=False), args.metric)
+    finally:
+        store.close()
+    with ExcelWorkbook(args.output) as workbook:
+        workbook.write_frame(args.action.title(), frame.rename(columns=sheet_column))
+    print(f"Wrote {len(frame)} {args.action} rows to {args.output}")
+
+
+# Function to time each subcommand's imports in a fresh interpreter (best of `repeat` runs)
+def bench_imports(args):
+    import subprocess
+    import time
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    slow = []
+    for command, modules in COMMAND_MODULES.items():
+        code = f"import cli\nfor module in {modules!r}:\n    __import__(module)"
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=here)
+            timings.append((time.perf_counter() - start) * 1000)
+            if result.returncode:
+                print(f"{command:8} import failed: {result.stderr.strip().splitlines()[-1]}")
+                break
+        else:
+            best = min(timings)
+            over = args.budget_ms is not None and best > args.budget_ms
+            slow += [command] if over else []
+            print(f"{command:8} {best:7.0f} ms{'  OVER BUDGET' if over else ''}")
+            if args.top:
+                result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                        capture_output=True, text=True, cwd=here)
+                rows = [line.split('|') for line in result.stderr.splitlines()[1:] if line.count('|') == 2]
+                rows = sorted(((int(cumulative), name.strip()) for _, cumulative, name in rows
+                               if cumulative.strip().isdigit()), reverse=True)
+                for cumulative, name in rows[:args.top]:
+                    print(f"{'':8} {cumulative / 1000:7.0f} ms  {name}")
+    if slow:
+        raise SystemExit(f"Import budget of {args.budget_ms} ms exceeded by: {', '.join(slow)}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Crawl, 404-check and PageSpeed audit tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    check = commands.add_parser('check', help="check URL statuses (404s and errors)")
+    check.add_argument('input', help=".xlsx with a URL column, or a text file with one URL per line")
+    check.add_argument('-o', '--output', default='statuses.xlsx', help=".xlsx or .csv")
+    check.add_argument('--concurrency', type=int, default=1000)
+    check.add_argument('--per-host', type=int, default=8)
+    check.set_defaults(func=run_check)
+
+    site = commands.add_parser('site', help="crawl, 404-check and audit one site without prompts")
+    site.add_argument('url')
+    site.add_argument('--api-key', help="PageSpeed API key(s), comma-separated")
+    site.add_argument('--strategy', default='desktop', choices=['desktop', 'mobile'])
+    site.add_argument('--output-dir', default='.')
+    site.add_argument('--prefix-weights', help="e.g. /blog=2,/tag=0.5")
+    site.add_argument('--max-audits', type=int)
+    site.add_argument('--audit-minutes', type=float)
+    site.add_argument('--per-template', type=int)
+    site.add_argument('--max-depth', type=int)
+    site.add_argument('--max-pages', type=int)
+    site.add_argument('--crawl-minutes', type=float)
+    site.add_argument('--quotas', help="per-prefix page quotas, e.g. /blog/tag=200")
+    site.add_argument('--include', help="comma-separated regexes")
+    site.add_argument('--exclude', help="comma-separated regexes")
+    site.add_argument('--dedupe-distance', type=int, default=6, help="simhash bits for near-duplicate pages")
+    site.add_argument('--known-urls', help="sitemap export or URL list (.xlsx or text) used to find orphan pages")
+    site.add_argument('--no-dedupe', action='store_true', help="crawl, check and audit every near-duplicate")
+    site.set_defaults(func=run_site_command)
+
+    batch = commands.add_parser('batch', help="run every site in a JSON config")
+    batch.add_argument('config')
+    batch.add_argument('--summary', default='batch_summary.xlsx')
+    batch.set_defaults(func=run_batch_command)
+
+    reports = commands.add_parser('reports', help="serve or prune stored Lighthouse reports")
+    reports.add_argument('action', choices=['serve', 'evict', 'usage'])
+    reports.add_argument('--root', default='reports')
+    reports.add_argument('--port', type=int, default=8765)
+    reports.add_argument('--max-age-days', type=float)
+    reports.add_argument('--keep-runs', type=int)
+    reports.set_defaults(func=run_reports)
+
+    history = commands.add_parser('history', help="export regressions or metric trends from the audit history")
+    history.add_argument('action', choices=['regressions', 'trend'])
+    history.add_argument('--db', default='audit_history.sqlite')
+    history.add_argument('--site')
+    history.add_argument('--strategy', choices=['desktop', 'mobile'])
+    history.add_argument('--metric', default='lcp', help="trend metric, e.g. lcp, tbt, cls, performance")
+    history.add_argument('--since', help="ISO date; trend only")
+    history.add_argument('-o', '--output', default='history.xlsx')
+    history.set_defaults(func=run_history)
+
+    bench = commands.add_parser('bench-imports', help="time each subcommand's imports")
+    bench.add_argument('--repeat', type=int, default=3)
+    bench.add_argument('--budget-ms', type=float, help="exit non-zero if a subcommand is slower")
+    bench.add_argument('--top', type=int, default=0, help="also list the N slowest modules per subcommand")
+    bench.set_defaults(func=bench_imports)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command not in ('bench-imports', 'reports', 'history'):
+        from structured_logging import setup_logging
+        setup_logging()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,59 @@
 import time
 import requests
-import pandas as pd
 import asyncio
 import aiohttp
 import urllib.parse
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, urljoin
+from status_checker import check_urls
+import logging
+from structured_logging import setup_logging, log_url, ProgressReporter
+from html_fetcher import fetch_html_sync
+from retry_policy import get_policy, raise_for_retry, CircuitOpenError, RetryableError
+from excel_export import save_rows
+from http_client import get_client, API_TIMEOUT, PAGE_TIMEOUT
+
+logger = logging.getLogger(__name__)
 
 # Function to extract links from a webpage
 def extract_links(url, retries=3):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'DNT': '1',
-    }
-    for attempt in range(retries):
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, "html.parser")
-                links = soup.find_all('a', href=True)
-                url_list = [link['href'] for link in links if link['href'].startswith('http')]
-                return url_list
-            else:
-                print(f"Failed to retrieve {url}: Status code {response.status_code}")
-                return []
-        except requests.exceptions.RequestException as e:
-            print(f"Error occurred while fetching {url}: {e}")
-            return []
-
-# Function to check if a URL redirects to a 404 page
-def check_404(url):
+    def fetch():
+        result = fetch_html_sync(get_client().sync_session(), url, timeout=PAGE_TIMEOUT)
+        raise_for_retry(result.status)
+        return result
+
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 404:
-            return url, "Redirects to 404"
-        return url, "Pass"
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred while checking {url}: {e}")
-        return url, "Error checking URL"
+        result = get_policy().call_sync(url, fetch, attempts=retries)
+    except CircuitOpenError:
+        log_url(logger, logging.DEBUG, "Host circuit open, skipping page", url)
+        return []
+    except (requests.exceptions.RequestException, RetryableError) as e:
+        log_url(logger, logging.ERROR, "Error occurred while fetching page", url, error=str(e))
+        return []
+
+    if result.html is not None:
+        soup = BeautifulSoup(result.html, "html.parser")
+        links = soup.find_all('a', href=True)
+        url_list = [link['href'] for link in links if link['href'].startswith('http')]
+        return url_list
+    elif result.skipped:
+        log_url(logger, logging.DEBUG, "Skipped non-HTML resource", url, reason=result.skipped)
+    else:
+        log_url(logger, logging.WARNING, "Failed to retrieve page", url, status=result.status)
+    return []
 
 # Function to get detailed page speed insights
 def get_page_speed_insights(url, api_key):
     api_url = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url}&key={api_key}"
+
+    def fetch():
+        response = get_client().sync_session().get(api_url, timeout=API_TIMEOUT)
+        raise_for_retry(response.status_code, response.headers.get('Retry-After'))
+        return response
+
     try:
-        response = requests.get(api_url)
+        response = get_policy().call_sync(url, fetch)  # breaker keyed on the audited site, not googleapis.com
         if response.status_code == 200:
             data = response.json()
             metrics = data['lighthouseResult']['audits']
@@ -62,16 +68,19 @@ def get_page_speed_insights(url, api_key):
             }
             return result
         else:
-            print(f"Failed to retrieve PageSpeed Insights for {url}: Status code {response.status_code}")
+            log_url(logger, logging.ERROR, "Failed to retrieve PageSpeed Insights", url, status=response.status_code)
             return {'URL': url}
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred while fetching PageSpeed Insights for {url}: {e}")
+    except (requests.exceptions.RequestException, RetryableError) as e:
+        log_url(logger, logging.ERROR, "Error occurred while fetching PageSpeed Insights", url, error=str(e))
+        return {'URL': url}
+    except CircuitOpenError:
         return {'URL': url}
 
 # Function to crawl a website and collect all the URLs
 def crawl_website(start_url, domain):
     all_urls = set()
     to_crawl = [start_url]
+    progress = ProgressReporter(logger, 'crawl')
 
     while to_crawl:
         url = to_crawl.pop(0)
@@ -79,9 +88,11 @@ def crawl_website(start_url, domain):
         if url in all_urls:
             continue
 
-        print(f"Crawling {url}...")
+        log_url(logger, logging.DEBUG, "Crawling", url)
         links = extract_links(url)
         all_urls.add(url)
+        progress.incr('crawled')
+        progress.incr('queued', len(links))
 
         for link in links:
             full_url = urljoin(url, link)
@@ -90,10 +101,12 @@ def crawl_website(start_url, domain):
 
         time.sleep(0.5)  # Control the crawling speed
 
+    progress.report()
     return all_urls
 
 # Main function to process crawling, 404 checks, and page speed insights
 def main():
+    setup_logging()
     start_url = input("Enter the website URL: ")
     api_key = input("Enter your Google PageSpeed Insights API key: ")
     domain = urlparse(start_url).netloc
@@ -104,14 +117,8 @@ def main():
 
     # Step 2: Check for 404 redirects
     output404_file = 'output404resurrection.xlsx'
-    to_check_404 = []
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(check_404, url) for url in all_urls]
-        for future in as_completed(futures):
-            url, status = future.result()
-            if status == "Redirects to 404":
-                to_check_404.append(url)
+    statuses = check_urls(all_urls)
+    to_check_404 = [url for url, status in statuses.items() if status == "Redirects to 404"]
 
     if to_check_404:
         print(f"Found {len(to_check_404)} URLs that redirect to 404.")
@@ -127,9 +134,10 @@ def main():
             speed_results.append(result)
 
     # Save PageSpeed results to Excel
-    df_speed = pd.DataFrame(speed_results)
-    df_speed.to_excel(outputinsight_file, index=False, engine='openpyxl')
+    save_rows(outputinsight_file, speed_results)
     print(f"Saved PageSpeed Insights results to {outputinsight_file}")
+    logger.info(f"HTTP pool stats: {get_client().pool_stats()}")
+    logger.info(f"Retry policy: {get_policy().summary()}")
 
 # Run the main function
 if __name__ == "__main__":
@@ -1,174 +1,103 @@
 import time
-import requests
-import pandas as pd
 import asyncio
-import aiohttp
-import urllib.parse
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from status_checker import StatusChecker
 from urllib.parse import urlparse, urljoin
+import logging
+from structured_logging import setup_logging, log_url, ProgressReporter
+from html_fetcher import fetch_html
+from retry_policy import get_policy, raise_for_retry, CircuitOpenError
+from http_client import get_client, close_client, PAGE_TIMEOUT
+from visited_set import VisitedSet, DiskUrlQueue
+from excel_export import save_rows
+from pagespeed_client import PageSpeedClient
+
+logger = logging.getLogger(__name__)
+
+# Function to extract links from a webpage without blocking the event loop the audits run on
+async def extract_links(url, session, retries=3):
+    async def fetch():
+        result = await fetch_html(session, url, timeout=get_client().client_timeout(PAGE_TIMEOUT))
+        raise_for_retry(result.status)
+        return result
 
-# Function to extract links from a webpage
-def extract_links(url, retries=3):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'DNT': '1',
-    }
-    for attempt in range(retries):
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, "html.parser")
-                links = soup.find_all('a', href=True)
-                url_list = [link['href'] for link in links if link['href'].startswith('http')]
-                return url_list
-            else:
-                print(f"Failed to retrieve {url}: Status code {response.status_code}")
-                return []
-        except requests.exceptions.RequestException as e:
-            print(f"Error occurred while fetching {url}: {e}")
-            return []
-
-# Asynchronous function to fetch PageSpeed Insights using Lighthouse with retry logic
-async def fetch_pagespeed_insights_async(url, session, api_key, strategy, semaphore, retries=3):
-    url_encoded = urllib.parse.quote(url, safe=":/")
-    api_url = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url_encoded}&key={api_key}&strategy={strategy}"
-
-    async with semaphore:
-        for attempt in range(retries):
-            try:
-                await asyncio.sleep(1)
-                async with session.get(api_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        metrics = extract_metrics(data, url)
-                        return metrics
-                    elif response.status in (500, 503):
-                        print(f"Server error for {url} (status {response.status}). Retrying...")
-                        await asyncio.sleep(2 ** attempt)
-                    else:
-                        print(f"Error fetching data for {url}: {response.status}.")
-                        return {'URL': url, 'Status': 'Failed', 'Report Link': api_url}
-            except Exception as e:
-                print(f"Unexpected error for {url}: {e}. Retrying...")
-                await asyncio.sleep(2 ** attempt)
-        print(f"Failed to fetch data for {url} after {retries} attempts.")
-        return {'URL': url, 'Status': 'Failed', 'Report Link': api_url}
-
-# Function to extract relevant metrics from Lighthouse results
-def extract_metrics(data, url):
     try:
-        lighthouse_data = data.get('lighthouseResult', {})
-        performance_score = lighthouse_data.get('categories', {}).get('performance', {}).get('score', 0) * 100
-        seo_score = lighthouse_data.get('categories', {}).get('seo', {}).get('score', None)
-        if seo_score is not None:
-            seo_score *= 100
-
-        pwa_score = lighthouse_data.get('categories', {}).get('pwa', {}).get('score', None)
-        if pwa_score is not None:
-            pwa_score *= 100
-
-        core_web_vitals = lighthouse_data.get('audits', {})
-        load_time = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
-        fcp = core_web_vitals.get('first-contentful-paint', {}).get('numericValue', 0) / 1000
-        lcp = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
-        ttb = core_web_vitals.get('total-blocking-time', {}).get('numericValue', 0) / 1000
-        speed_index = core_web_vitals.get('speed-index', {}).get('numericValue', 0) / 1000
-        cls = core_web_vitals.get('cumulative-layout-shift', {}).get('numericValue', 0)
-
-        return {
-            'URL': url,
-            'Performance Score': performance_score,
-            'SEO Score': seo_score,
-            'PWA Score': pwa_score,
-            'Load Time (seconds)': load_time,
-            'First Contentful Paint (seconds)': fcp,
-            'Largest Contentful Paint (seconds)': lcp,
-            'Total Blocking Time (seconds)': ttb,
-            'Speed Index (seconds)': speed_index,
-            'Cumulative Layout Shift (CLS)': cls,
-            'Status': 'Pass'
-        }
-    except KeyError as e:
-        print(f"Error extracting metrics for {url}: {e}")
-        return {'URL': url, 'Status': 'Failed', 'Report Link': url}
-
-# Function to check if a URL redirects to a 404 page
-def check_404(url):
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 404:
-            return url, "Redirects to 404"
-        return url, "Pass"
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred while checking {url}: {e}")
-        return url, "Error checking URL"
+        result = await get_policy().call(url, fetch, attempts=retries)
+    except CircuitOpenError:
+        log_url(logger, logging.DEBUG, "Host circuit open, skipping page", url)
+        return []
+    except Exception as e:
+        log_url(logger, logging.ERROR, "Error occurred while fetching page", url, error=str(e))
+        return []
+
+    if result.html is not None:
+        soup = BeautifulSoup(result.html, "html.parser")
+        links = soup.find_all('a', href=True)
+        url_list = [link['href'] for link in links if link['href'].startswith('http')]
+        return url_list
+    elif result.skipped:
+        log_url(logger, logging.DEBUG, "Skipped non-HTML resource", url, reason=result.skipped)
+    else:
+        log_url(logger, logging.WARNING, "Failed to retrieve page", url, status=result.status)
+    return []
 
 # Optimized function to crawl a website and collect all the URLs
-async def crawl_website(start_url, domain, api_key, semaphore_pagespeed):
-    all_urls = set()
-    to_crawl = [start_url]
-
-    async with aiohttp.ClientSession() as session:
-        while to_crawl:
-            url = to_crawl.pop(0)
-            if url in all_urls:
-                continue
-
-            print(f"Crawling {url}...")
-            links = extract_links(url)
-            all_urls.add(url)
-
-            # Start fetching PageSpeed Insights for the crawled URL
-            asyncio.create_task(fetch_pagespeed_insights_async(url, session, api_key, "desktop", semaphore_pagespeed))
-
-            for link in links:
-                full_url = urljoin(url, link)
-                if domain in urlparse(full_url).netloc and full_url not in all_urls:
-                    to_crawl.append(full_url)
-
-            await asyncio.sleep(0.1)  # Reduced delay to speed up crawling
-
+async def crawl_website(start_url, domain, results_file='crawled_urls.txt'):
+    visited = VisitedSet()  # fingerprints only; full URLs live in the on-disk queues
+    to_crawl = DiskUrlQueue()
+    all_urls = DiskUrlQueue(results_file)
+    progress = ProgressReporter(logger, 'crawl')
+
+    visited.add(start_url)
+    to_crawl.push(start_url)
+    session = await get_client().session()
+    while to_crawl:
+        url = to_crawl.pop()
+
+        log_url(logger, logging.DEBUG, "Crawling", url)
+        links = await extract_links(url, session)
+        all_urls.push(url)
+        progress.incr('crawled')
+        progress.incr('queued', len(links))
+
+        for link in links:
+            full_url = urljoin(url, link)
+            if domain in urlparse(full_url).netloc and visited.add(full_url):
+                to_crawl.push(full_url)
+
+        await asyncio.sleep(0.1)  # Reduced delay to speed up crawling
+
+    to_crawl.close()
+    progress.report()
+    logger.info(f"Visited set: {len(visited)} URLs at {visited.bytes_per_url():.1f} bytes/URL")
     return all_urls
 
 # Function to save results to an Excel file
 def save_to_excel(urls, output_file):
-    df = pd.DataFrame(list(urls), columns=["URL"])
-    df.to_excel(output_file, index=False)
-    print(f"Saved {len(urls)} URLs to {output_file}")
+    count = save_rows(output_file, ({'URL': url} for url in urls), columns=['URL'])
+    print(f"Saved {count} URLs to {output_file}")
 
 # Function to save PageSpeed Insights results to Excel
 def save_results_to_excel(results, filename):
-    df = pd.DataFrame(results)
-    df.to_excel(filename, index=False)
+    save_rows(filename, results)
     print(f"Saved PageSpeed Insights to {filename}")
 
 # Main function to process crawling, 404 check, and PageSpeed Insights
 async def main():
+    setup_logging()
     start_url = input("Enter the website URL: ")
     domain = urlparse(start_url).netloc
-    api_key = input("Enter your Google PageSpeed API key: ")
+    api_key = input("Enter your Google PageSpeed API key(s), comma-separated: ")
 
     # Step 1: Crawl the website to extract all URLs
-    semaphore_pagespeed = asyncio.Semaphore(10)  # Control concurrency for PageSpeed requests
-    all_urls = await crawl_website(start_url, domain, api_key, semaphore_pagespeed)
+    all_urls = await crawl_website(start_url, domain)
 
     print(f"Extracted {len(all_urls)} URLs from {start_url}.")
 
     # Step 2: Check each URL for 404 redirects
     output404_file = 'output404resurrection.xlsx'
-    to_check = all_urls.copy()
-    to_check_404 = []
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(check_404, url) for url in to_check]
-        for future in as_completed(futures):
-            url, status = future.result()
-            if status == "Redirects to 404":
-                to_check_404.append(url)
+    statuses = await StatusChecker().check_all(all_urls)
+    to_check_404 = {url for url, status in statuses.items() if status == "Redirects to 404"}
 
     if to_check_404:
         save_to_excel(to_check_404, output404_file)
@@ -179,12 +108,13 @@ async def main():
     results = []
 
     if to_check_pagespeed:
-        async with aiohttp.ClientSession() as session:
-            semaphore = asyncio.Semaphore(10)  # Control concurrency for PageSpeed requests
-            tasks = [fetch_pagespeed_insights_async(url, session, api_key, "desktop", semaphore) for url in to_check_pagespeed]
-            results = await asyncio.gather(*tasks)
+        pagespeed = PageSpeedClient(api_key, strategy="desktop", concurrency=10)  # Control concurrency for PageSpeed requests
+        results = await asyncio.gather(*(pagespeed.audit(url) for url in to_check_pagespeed))
 
     save_results_to_excel(results, output_pagespeed_file)
+    logger.info(f"HTTP pool stats: {get_client().pool_stats()}")
+    logger.info(f"Retry policy: {get_policy().summary()}")
+    await close_client()
 
 # Run the main function
 if __name__ == "__main__":
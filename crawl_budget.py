@@ -0,0 +1,82 @@
+import collections
+import re
+import time
+from urllib.parse import urlparse
+
+
+# Function to parse comma-separated regular expressions
+def parse_patterns(text):
+    return [re.compile(item.strip()) for item in (text or '').split(',') if item.strip()]
+
+
+# Function to parse per-prefix page quotas such as "/blog/tag=200, /page=50"
+def parse_quotas(text):
+    quotas = {}
+    for item in (text or '').split(','):
+        if '=' in item:
+            prefix, limit = item.split('=', 1)
+            quotas[prefix.strip()] = int(limit)
+    return quotas
+
+
+# Limits on how far and how long a crawl may run
+class CrawlBudget:
+    def __init__(self, max_depth=None, max_pages=None, prefix_quotas=None,
+                 include=None, exclude=None, deadline_seconds=None):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        # Longest prefix wins, so "/blog/tag" can have its own quota inside "/blog"
+        self.prefix_quotas = sorted((prefix_quotas or {}).items(), key=lambda item: -len(item[0]))
+        self._quota_limits = dict(self.prefix_quotas)
+        self.include = include or []
+        self.exclude = exclude or []
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.pages_fetched = 0
+        self.prefix_counts = collections.Counter()
+        self.rejected = collections.Counter()
+        self.stop_reason = None
+
+    def _quota_prefix(self, url):
+        path = urlparse(url).path or '/'
+        for prefix, _ in self.prefix_quotas:
+            if path.startswith(prefix):
+                return prefix
+        return None
+
+    # Function to decide whether a discovered URL may enter the frontier
+    def allows(self, url, depth):
+        if self.max_depth is not None and depth > self.max_depth:
+            self.rejected['depth'] += 1
+            return False
+        if self.include and not any(pattern.search(url) for pattern in self.include):
+            self.rejected['include'] += 1
+            return False
+        if any(pattern.search(url) for pattern in self.exclude):
+            self.rejected['exclude'] += 1
+            return False
+        prefix = self._quota_prefix(url)
+        if prefix is not None:
+            if self.prefix_counts[prefix] >= self._quota_limits[prefix]:
+                self.rejected[f"quota {prefix}"] += 1
+                return False
+            self.prefix_counts[prefix] += 1
+        return True
+
+    def record_fetch(self):
+        self.pages_fetched += 1
+
+    # Function to check whether the crawl should stop taking new work
+    def exhausted(self):
+        if self.stop_reason is None:
+            if self.max_pages is not None and self.pages_fetched >= self.max_pages:
+                self.stop_reason = f"page limit ({self.max_pages}) reached"
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stop_reason = "crawl deadline reached"
+        return self.stop_reason is not None
+
+    def summary(self):
+        return {
+            'pages fetched': self.pages_fetched,
+            'stop reason': self.stop_reason or 'frontier empty',
+            'rejected': dict(self.rejected),
+        }
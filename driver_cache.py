@@ -0,0 +1,52 @@
+import json
+import os
+import time
+
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'site-audit', 'chromedriver.json')
+MAX_AGE_DAYS = 7  # Chrome auto-updates; re-resolve weekly so the driver keeps matching it
+
+
+def _read_cache(max_age_days):
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get('resolved_at', 0) > max_age_days * 86400:
+        return None
+    if not os.path.isfile(cached.get('path', '')):
+        return None
+    return cached['path']
+
+
+def _write_cache(path):
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp_path = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'path': path, 'resolved_at': time.time()}, f)
+    os.replace(tmp_path, CACHE_FILE)
+
+
+# Function to find chromedriver without a network lookup on every run:
+# $CHROMEDRIVER_PATH, then the on-disk cache, then webdriver_manager (which is cached for next time)
+def chromedriver_path(max_age_days=MAX_AGE_DAYS, refresh=False):
+    override = os.environ.get('CHROMEDRIVER_PATH')
+    if override:
+        return override
+    if not refresh:
+        cached = _read_cache(max_age_days)
+        if cached:
+            return cached
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    _write_cache(path)
+    return path
+
+
+# Function to drop the cached path, e.g. after Chrome reports a version mismatch
+def clear_cache():
+    try:
+        os.remove(CACHE_FILE)
+    except FileNotFoundError:
+        pass
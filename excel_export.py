@@ -0,0 +1,111 @@
+import math
+import numbers
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+
+# Columns written as clickable links
+LINK_COLUMNS = ('URL', 'Final URL', 'Canonical URL', 'Report Link')
+MAX_ROWS = 1048576 - 1  # Excel's row limit, less the header; longer sheets continue as "Crawl (2)", ...
+MAX_CELL_CHARS = 32767
+# Excel ignores hyperlinks past this many per sheet and longer than this many characters
+MAX_LINKS_PER_SHEET = 65530
+MAX_LINK_CHARS = 2079
+LINK_FONT = Font(color='0563C1', underline='single')
+HEADER_FONT = Font(bold=True)
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (list, tuple, set)):
+        value = ', '.join(str(item) for item in value)
+    elif isinstance(value, bool):
+        pass
+    elif isinstance(value, numbers.Integral):
+        value = int(value)  # numpy integers from DataFrames
+    elif isinstance(value, numbers.Real):
+        value = float(value)
+    elif not isinstance(value, str):
+        value = str(value)
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)[:MAX_CELL_CHARS]
+    return value
+
+
+# Streaming Excel writer: rows go straight to disk, so memory does not grow with row count
+class ExcelWorkbook:
+    def __init__(self, path, link_columns=LINK_COLUMNS):
+        self.path = path
+        self.link_columns = set(link_columns)
+        self.workbook = Workbook(write_only=True)
+        self.row_counts = {}
+        self._link_counts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
+
+    # Function to make a link cell; the URL stays the cell value so readers get plain text back,
+    # and past Excel's per-sheet hyperlink limit the URL is written unlinked
+    def _link_cell(self, sheet, value):
+        if not isinstance(value, str) or not value.startswith(('http://', 'https://', 'file://')) \
+                or len(value) > MAX_LINK_CHARS:
+            return value
+        cell = WriteOnlyCell(sheet, value=value)
+        count = self._link_counts.get(sheet.title, 0)
+        if count < MAX_LINKS_PER_SHEET:
+            cell.hyperlink = value
+            cell.font = LINK_FONT
+            self._link_counts[sheet.title] = count + 1
+        return cell
+
+    def _new_sheet(self, title, columns, part):
+        sheet = self.workbook.create_sheet(title if part == 1 else f"{title} ({part})")
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(sheet, value=column)
+            cell.font = HEADER_FONT
+            header.append(cell)
+        sheet.append(header)
+        return sheet
+
+    # Function to stream rows (dicts) into a new sheet; columns default to every key seen
+    def write_sheet(self, title, rows, columns=None):
+        if columns is None:
+            rows = list(rows)
+            columns = list(dict.fromkeys(key for row in rows for key in row))
+        links = [column in self.link_columns for column in columns]
+        part, written = 1, 0
+        sheet = self._new_sheet(title, columns, part)
+        for row in rows:
+            if written and written % MAX_ROWS == 0:
+                part += 1
+                sheet = self._new_sheet(title, columns, part)
+            values = [_clean(row.get(column)) for column in columns]
+            sheet.append([self._link_cell(sheet, value) if link else value
+                          for value, link in zip(values, links)])
+            written += 1
+        self.row_counts[title] = written
+        return written
+
+    # Function to stream a DataFrame into a new sheet without copying it into dicts
+    def write_frame(self, title, frame):
+        columns = [str(column) for column in frame.columns]
+        rows = (dict(zip(columns, values)) for values in frame.itertuples(index=False, name=None))
+        return self.write_sheet(title, rows, columns)
+
+    def save(self):
+        if not self.workbook.worksheets:
+            self.workbook.create_sheet('Sheet1')
+        self.workbook.save(self.path)
+
+
+# Function to write one sheet of rows to its own workbook
+def save_rows(path, rows, title='Sheet1', columns=None):
+    with ExcelWorkbook(path) as workbook:
+        return workbook.write_sheet(title, rows, columns)
@@ -1,62 +1,76 @@
 import os
 import time
-import requests
 import pandas as pd
 import asyncio
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from status_checker import StatusChecker, check_urls
+from http_client import get_client, close_client, PAGE_TIMEOUT
 from urllib.parse import urlparse, urljoin
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_cache import chromedriver_path
 import json
-import aiohttp
+import logging
+from structured_logging import setup_logging, log_url, ProgressReporter
+from html_fetcher import fetch_html
+from retry_policy import get_policy, raise_for_retry
+from excel_export import ExcelWorkbook, save_rows
+
+logger = logging.getLogger(__name__)
 
 # Function to extract links asynchronously from a webpage
 async def extract_links_async(session, url):
+    async def fetch():
+        result = await fetch_html(session, url, timeout=get_client().client_timeout(PAGE_TIMEOUT))
+        raise_for_retry(result.status)
+        return result
+
     try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                content = await response.text()
-                soup = BeautifulSoup(content, "html.parser")
-                links = soup.find_all('a', href=True)
-                return [link['href'] for link in links if link['href'].startswith('http')]
-            else:
-                print(f"Failed to retrieve {url}: Status code {response.status}")
-                return []
+        result = await get_policy().call(url, fetch)
+        if result.html is not None:
+            soup = BeautifulSoup(result.html, "html.parser")
+            links = soup.find_all('a', href=True)
+            return [link['href'] for link in links if link['href'].startswith('http')]
+        elif result.skipped is None:
+            log_url(logger, logging.WARNING, "Failed to retrieve page", url, status=result.status)
+        return []
     except Exception as e:
-        print(f"Error occurred while fetching {url}: {e}")
+        log_url(logger, logging.ERROR, "Error occurred while fetching page", url, error=str(e))
         return []
 
 # Asynchronous function to crawl a website and collect all the URLs
 async def crawl_website_async(start_url, domain):
     all_urls = set()
     to_crawl = [start_url]
-    async with aiohttp.ClientSession() as session:
-        while to_crawl:
-            url = to_crawl.pop(0)
-            if url in all_urls:
-                continue
-
-            print(f"Crawling {url}...")
-            links = await extract_links_async(session, url)
-            all_urls.add(url)
-
-            for link in links:
-                full_url = urljoin(url, link)
-                if domain in urlparse(full_url).netloc and full_url not in all_urls:
-                    to_crawl.append(full_url)
-
-            await asyncio.sleep(0.5)  # Adjust as needed for server load
-
+    progress = ProgressReporter(logger, 'crawl')
+    session = await get_client().session()
+    while to_crawl:
+        url = to_crawl.pop(0)
+        if url in all_urls:
+            continue
+
+        log_url(logger, logging.DEBUG, "Crawling", url)
+        links = await extract_links_async(session, url)
+        all_urls.add(url)
+        progress.incr('crawled')
+        progress.incr('queued', len(links))
+
+        for link in links:
+            full_url = urljoin(url, link)
+            if domain in urlparse(full_url).netloc and full_url not in all_urls:
+                to_crawl.append(full_url)
+
+        await asyncio.sleep(0.5)  # Adjust as needed for server load
+
+    progress.report()
     return all_urls
 
 # Function to create a Selenium WebDriver
 def create_driver():
     chrome_options = ChromeOptions()
     chrome_options.add_argument("--headless")  # Optional: run in headless mode
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=chrome_options)
+    driver = webdriver.Chrome(service=ChromeService(chromedriver_path()), options=chrome_options)
     return driver
 
 # Function to run Lighthouse using Selenium
@@ -106,54 +120,37 @@ def extract_metrics(data, url):
             'Status': 'Success'
         }
     except KeyError as e:
-        print(f"Error extracting metrics for {url}: {e}")
+        log_url(logger, logging.ERROR, "Error extracting metrics", url, error=str(e))
         return {'URL': url, 'Status': 'Failed'}
 
-# Function to check if a URL redirects to a 404 page
-def check_404(url):
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 404:
-            return url, "Redirects to 404"
-        return url, "Pass"
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred while checking {url}: {e}")
-        return url, "Error checking URL"
-
 # Optimized URL checking in Excel
-def check_urls_in_excel(input_excel_file, output_excel_file, max_workers=10):
+def check_urls_in_excel(input_excel_file, output_excel_file, concurrency=1000):
     df = pd.read_excel(input_excel_file)
 
     if 'URL' not in df.columns:
         print("The Excel file does not contain a column named 'URL'.")
         return
     urls = df['URL'].dropna().tolist()
-    result = []
+    result = check_urls(urls, concurrency=concurrency)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(check_404, url) for url in urls]
-        for future in as_completed(futures):
-            url, status = future.result()
-            result.append((url, status))
-
-    df['Status'] = df['URL'].apply(lambda x: dict(result).get(x, "Empty URL"))
-    df.to_excel(output_excel_file, index=False)
+    df['Status'] = df['URL'].apply(lambda x: result.get(x, "Empty URL"))
+    with ExcelWorkbook(output_excel_file) as workbook:
+        workbook.write_frame('Sheet1', df)
     print(f"Results written to {output_excel_file}")
 
 # Function to save results to an Excel file
 def save_to_excel(urls, output_file):
-    df = pd.DataFrame(list(urls), columns=["URL"])
-    df.to_excel(output_file, index=False)
-    print(f"Saved {len(urls)} URLs to {output_file}")
+    count = save_rows(output_file, ({'URL': url} for url in urls), columns=['URL'])
+    print(f"Saved {count} URLs to {output_file}")
 
 # Function to save Lighthouse results to Excel
 def save_results_to_excel(results, filename):
-    df = pd.DataFrame(results)
-    df.to_excel(filename, index=False)
+    save_rows(filename, results)
     print(f"Saved Lighthouse results to {filename}")
 
 # Main function to process crawling, 404 check, and Lighthouse analysis
 async def main():
+    setup_logging()
     start_url = input("Enter the website URL: ")
     domain = urlparse(start_url).netloc
 
@@ -163,15 +160,9 @@ async def main():
 
     # Step 2: Check each URL for 404 redirects
     output404_file = 'output404resurrection.xlsx'
-    to_check = all_urls.copy()
-    to_check_404 = []
-
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(check_404, url) for url in to_check]
-        for future in as_completed(futures):
-            url, status = future.result()
-            if status == "Redirects to 404":
-                to_check_404.append(url)
+    statuses = await StatusChecker().check_all(all_urls)
+    to_check_404 = {url for url, status in statuses.items() if status == "Redirects to 404"}
+    await close_client()
 
     if to_check_404:
         save_to_excel(to_check_404, output404_file)
@@ -180,10 +171,13 @@ async def main():
     output_lighthouse_file = 'output_lighthouse_results.xlsx'
     results = []
 
+    progress = ProgressReporter(logger, 'lighthouse')
     for url in all_urls:
         if url not in to_check_404:
             result = run_lighthouse(url)
             results.append(result)
+            progress.incr(result['Status'].lower())
+    progress.report()
 
     save_results_to_excel(results, output_lighthouse_file)
 
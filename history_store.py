@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+DEFAULT_DB = 'audit_history.sqlite'
+
+# History column -> audit result column
+METRICS = {
+    'performance': 'Performance Score',
+    'seo': 'SEO Score',
+    'fcp': 'First Contentful Paint (seconds)',
+    'lcp': 'Largest Contentful Paint (seconds)',
+    'tbt': 'Total Blocking Time (seconds)',
+    'speed_index': 'Speed Index (seconds)',
+    'cls': 'Cumulative Layout Shift (CLS)',
+}
+# A page regresses when a metric is worse than its baseline by both the absolute and the
+# relative margin; PSI run-to-run noise is well inside these
+REGRESSION_THRESHOLDS = {
+    'lcp': (0.25, 0.10),  # seconds, fraction of baseline
+    'tbt': (0.05, 0.10),
+    'cls': (0.02, 0.10),
+}
+BASELINE_RUNS = 7
+MIN_BASELINE_RUNS = 3
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    site TEXT NOT NULL,
+    strategy TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_site ON runs (site, strategy, run_id);
+CREATE TABLE IF NOT EXISTS urls (
+    url_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS audits (
+    run_id INTEGER NOT NULL,
+    url_id INTEGER NOT NULL,
+    {', '.join(f'{column} REAL' for column in METRICS)},
+    PRIMARY KEY (run_id, url_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS audits_by_url ON audits (url_id, run_id);
+"""
+
+
+# Append-only audit history in SQLite, one row per URL per run, with pandas queries on top
+class HistoryStore:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def _url_ids(self, urls):
+        self.db.executemany("INSERT OR IGNORE INTO urls (url) VALUES (?)", ((url,) for url in urls))
+        ids = {}
+        urls = list(urls)
+        for start in range(0, len(urls), 500):  # stay under SQLite's bound-parameter limit
+            chunk = urls[start:start + 500]
+            ids.update(self.db.execute(
+                f"SELECT url, url_id FROM urls WHERE url IN ({','.join('?' * len(chunk))})", chunk))
+        return ids
+
+    # Function to record one run's successful audit results; returns the run ID, or None (and
+    # records no run) when nothing succeeded, so the previous run stays the latest one
+    def append(self, site, strategy, results, started_at=None):
+        rows = [result for result in results if result.get('Status') == 'Success']
+        if not rows:
+            return None
+        started_at = started_at or datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with self.db:
+            run_id = self.db.execute("INSERT INTO runs (started_at, site, strategy) VALUES (?, ?, ?)",
+                                     (started_at, site, strategy)).lastrowid
+            url_ids = self._url_ids(dict.fromkeys(row['URL'] for row in rows))
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO audits VALUES (?, ?, {', '.join('?' * len(METRICS))})",
+                ([run_id, url_ids[row['URL']]] + [row.get(column) for column in METRICS.values()]
+                 for row in rows))
+        return run_id
+
+    # Function to load history as a DataFrame, optionally only the last N runs per site and strategy
+    def load(self, site=None, strategy=None, last_runs=None, since=None, url=None, metrics=None, with_urls=True):
+        import pandas as pd
+
+        metrics = list(metrics or METRICS)
+        conditions, params = [], []
+        if site is not None:
+            conditions.append("site = ?")
+            params.append(site)
+        if strategy is not None:
+            conditions.append("strategy = ?")
+            params.append(strategy)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+        if last_runs is not None:
+            conditions.append("""run_id IN (
+                SELECT run_id FROM (
+                    SELECT run_id, ROW_NUMBER() OVER (PARTITION BY site, strategy ORDER BY run_id DESC) AS rank
+                    FROM runs)
+                WHERE rank <= ?)""")
+            params.append(last_runs)
+        run_query = f"SELECT run_id FROM runs {'WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+        runs = pd.read_sql_query(run_query.replace('run_id', '*', 1), self.db, params=params)
+        runs['started_at'] = pd.to_datetime(runs['started_at'])
+
+        # Read only the narrow audit rows and attach run details in pandas; repeating site,
+        # strategy and timestamp strings on every row from SQLite costs more than the query
+        audit_conditions = [f"run_id IN ({run_query})"]
+        audit_params = list(params)
+        if url is not None:
+            audit_conditions.append("url_id = (SELECT url_id FROM urls WHERE url = ?)")
+            audit_params.append(url)
+        audits = pd.read_sql_query(
+            f"SELECT run_id, url_id, {', '.join(metrics)} FROM audits WHERE {' AND '.join(audit_conditions)}",
+            self.db, params=audit_params)
+        frame = runs.merge(audits, on='run_id')
+        # Grouped by URL in run order, which deltas() and rolling_medians() rely on
+        frame = frame.sort_values(['url_id', 'strategy', 'run_id'], ignore_index=True)
+        if with_urls:
+            ids = frame['url_id'].unique().tolist()
+            urls = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                urls.update(self.db.execute(
+                    f"SELECT url_id, url FROM urls WHERE url_id IN ({','.join('?' * len(chunk))})", chunk))
+            frame.insert(frame.columns.get_loc('url_id'), 'url', frame['url_id'].map(urls))
+        return frame
+
+    def close(self):
+        self.db.close()
+
+
+# Function to add run-over-run change per URL and strategy (frame must be sorted as load() returns it)
+def deltas(frame, metrics=('lcp', 'tbt', 'cls')):
+    grouped = frame.groupby(['url_id', 'strategy'], sort=False)
+    for metric in metrics:
+        frame[f'{metric}_delta'] = grouped[metric].diff()
+    return frame
+
+
+# Function to add a rolling median per URL and strategy
+def rolling_medians(frame, metrics=('lcp', 'tbt', 'cls'), window=BASELINE_RUNS):
+    grouped = frame.groupby(['url_id', 'strategy'], sort=False)
+    for metric in metrics:
+        rolled = grouped[metric].rolling(window, min_periods=1).median()
+        frame[f'{metric}_median'] = rolled.reset_index(level=[0, 1], drop=True)
+    return frame
+
+
+# Function to summarise each run with site-wide percentiles of a metric
+def percentile_trend(frame, metric='lcp', percentiles=(0.5, 0.75, 0.9)):
+    trend = frame.groupby(['site', 'strategy', 'run_id', 'started_at'])[metric].quantile(list(percentiles))
+    trend = trend.unstack()
+    trend.columns = [f'{metric} p{round(p * 100)}' for p in percentiles]
+    return trend.reset_index()
+
+
+# Function to flag pages whose latest LCP/TBT/CLS is worse than the median of their previous runs
+def regressions(frame, thresholds=REGRESSION_THRESHOLDS, min_baseline_runs=MIN_BASELINE_RUNS):
+    import pandas as pd
+
+    if frame.empty:
+        return frame
+    latest_run = frame.groupby(['site', 'strategy'])['run_id'].transform('max')
+    latest = frame[frame['run_id'] == latest_run].set_index(['site', 'strategy', 'url_id'])
+    history = frame[frame['run_id'] != latest_run].groupby(['site', 'strategy', 'url_id'])
+    baseline = history[list(thresholds)].median()
+    baseline['baseline_runs'] = history.size()
+    merged = latest.join(baseline, rsuffix='_baseline', how='inner')
+    merged = merged[merged['baseline_runs'] >= min_baseline_runs]
+
+    flagged = []
+    for metric, (absolute, relative) in thresholds.items():
+        change = merged[metric] - merged[f'{metric}_baseline']
+        worse = (change > absolute) & (change > relative * merged[f'{metric}_baseline'])
+        rows = merged.loc[worse, ['url', 'run_id', 'started_at', metric, f'{metric}_baseline', 'baseline_runs']].copy()
+        rows.columns = ['url', 'run_id', 'started_at', 'latest', 'baseline', 'baseline_runs']
+        rows.insert(0, 'metric', metric)
+        rows['change'] = rows['latest'] - rows['baseline']
+        flagged.append(rows.reset_index().drop(columns='url_id'))
+    report = pd.concat(flagged, ignore_index=True)
+    return report.sort_values(['site', 'strategy', 'metric', 'change'], ascending=[True, True, True, False])
+
+
+# Function to title a query column for a spreadsheet ('url' stays a clickable URL column)
+def sheet_column(name):
+    if name == 'url':
+        return 'URL'
+    return name.replace('_', ' ').title() if ' ' not in name else name
+
+
+# Function to time append and the regression query on synthetic nightly data
+def benchmark(path='history_benchmark.sqlite', urls=5000, runs=365):
+    import random
+
+    if os.path.exists(path):
+        os.remove(path)
+    store = HistoryStore(path)
+    pages = [f"https://www.example.com/page/{i}" for i in range(urls)]
+    start = time.perf_counter()
+    for run in range(runs):
+        results = [{'URL': page, 'Status': 'Success', METRICS['performance']: random.uniform(40, 100),
+                    METRICS['lcp']: random.gauss(2.5, 0.1), METRICS['tbt']: random.gauss(0.3, 0.02),
+                    METRICS['cls']: random.gauss(0.05, 0.005)} for page in pages]
+        store.append('https://www.example.com/', 'desktop', results,
+                     started_at=datetime.fromtimestamp(run * 86400, timezone.utc).isoformat())
+    append_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report = regressions(store.load(site='https://www.example.com/', last_runs=BASELINE_RUNS + 1))
+    regression_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    trend = percentile_trend(store.load(site='https://www.example.com/', metrics=['lcp'], with_urls=False))
+    trend_seconds = time.perf_counter() - start
+    store.close()
+    print(f"{urls * runs} rows: append {append_seconds:.1f} s, regression report {regression_seconds:.2f} s "
+          f"({len(report)} flagged), full-year percentile trend {trend_seconds:.1f} s ({len(trend)} runs), "
+          f"{os.path.getsize(path) / 1e6:.0f} MB on disk")
+
+
+if __name__ == "__main__":
+    benchmark()
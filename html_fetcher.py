@@ -0,0 +1,132 @@
+import codecs
+import collections
+import re
+from urllib.parse import urlsplit
+
+MAX_HTML_BYTES = 2 * 1024 * 1024  # links past the first 2 MB of a page are not worth the bandwidth
+CHUNK_SIZE = 64 * 1024
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Extensions that are never HTML; these URLs are skipped without a request
+NON_HTML_EXTENSIONS = {
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.apk',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.ico', '.bmp', '.tif', '.tiff',
+    '.mp4', '.webm', '.mov', '.avi', '.mkv', '.mp3', '.wav', '.ogg', '.m4a',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot',
+    '.css', '.js', '.json', '.xml', '.csv', '.xls', '.xlsx', '.doc', '.docx', '.ppt', '.pptx',
+}
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+FetchResult = collections.namedtuple('FetchResult', ['status', 'html', 'skipped', 'truncated'])
+fetch_stats = collections.Counter()
+
+
+# Function to recognise asset URLs by their path extension
+def looks_like_asset(url):
+    path = urlsplit(url).path.lower()
+    dot = path.rfind('.')
+    return dot > path.rfind('/') and path[dot:] in NON_HTML_EXTENSIONS
+
+
+# Function to decide from the Content-Type header whether a body is worth downloading
+def is_html(content_type):
+    if not content_type:
+        return True  # unlabelled responses are sniffed by the parser
+    return content_type.split(';', 1)[0].strip().lower() in HTML_TYPES
+
+
+# Function to pick the charset: header, then BOM, then <meta charset>, then UTF-8
+def sniff_charset(body, content_type=''):
+    match = HEADER_CHARSET.search(content_type or '')
+    candidates = [match.group(1)] if match else []
+    for bom, encoding in BOMS:
+        if body.startswith(bom):
+            candidates.append(encoding)
+    match = META_CHARSET.search(body[:4096])
+    if match:
+        candidates.append(match.group(1).decode('ascii', 'ignore'))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+# Function to read the declared body size, if the server sent a usable Content-Length
+def declared_length(headers):
+    value = (headers.get('Content-Length') or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def decode_html(body, content_type=''):
+    return body.decode(sniff_charset(body, content_type), errors='replace')
+
+
+def _skip(status, reason):
+    fetch_stats[f"skipped {reason}"] += 1
+    return FetchResult(status, None, reason, False)
+
+
+# Function to check the headers before any body is read. Pages declared larger than max_bytes
+# are skipped when skip_oversized is set; otherwise they are counted and streamed up to the cap.
+def _gate(status, headers, max_bytes, skip_oversized):
+    if status != 200:
+        return FetchResult(status, None, None, False)
+    if not is_html(headers.get('Content-Type', '')):
+        return _skip(status, 'content-type')
+    length = declared_length(headers)
+    if length is not None and length > max_bytes:
+        if skip_oversized:
+            return _skip(status, 'content-length')
+        fetch_stats['declared oversized'] += 1
+    return None
+
+
+# Function to fetch a page with aiohttp, skipping non-HTML and capping the body size
+# (timeout=None keeps the session's own timeout rather than disabling it)
+async def fetch_html(session, url, max_bytes=MAX_HTML_BYTES, timeout=None, skip_oversized=False):
+    if looks_like_asset(url):
+        return _skip(None, 'asset extension')
+    request_kwargs = {} if timeout is None else {'timeout': timeout}
+    async with session.get(url, **request_kwargs) as response:
+        content_type = response.headers.get('Content-Type', '')
+        gated = _gate(response.status, response.headers, max_bytes, skip_oversized)
+        if gated is not None:
+            return gated
+
+        chunks, size, truncated = [], 0, False
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                truncated = True
+                break
+    fetch_stats['bytes'] += size
+    fetch_stats['truncated'] += truncated
+    return FetchResult(200, decode_html(b''.join(chunks)[:max_bytes], content_type), None, truncated)
+
+
+# Function to fetch a page with a requests session, with the same gating as fetch_html
+def fetch_html_sync(session, url, max_bytes=MAX_HTML_BYTES, timeout=None, skip_oversized=False):
+    if looks_like_asset(url):
+        return _skip(None, 'asset extension')
+    with session.get(url, timeout=timeout, stream=True) as response:
+        content_type = response.headers.get('Content-Type', '')
+        gated = _gate(response.status_code, response.headers, max_bytes, skip_oversized)
+        if gated is not None:
+            return gated
+
+        chunks, size, truncated = [], 0, False
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                truncated = True
+                break
+    fetch_stats['bytes'] += size
+    fetch_stats['truncated'] += truncated
+    return FetchResult(200, decode_html(b''.join(chunks)[:max_bytes], content_type), None, truncated)
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import importlib.util
+from urllib.parse import urlparse
+
+import aiohttp
+
+# Shared request headers; previously copy-pasted into every script
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br' if importlib.util.find_spec('brotli') else 'gzip, deflate',
+    'DNT': '1',
+}
+
+PAGE_TIMEOUT = 10  # seconds, for crawled pages and status checks
+API_TIMEOUT = 60  # seconds, PageSpeed audits routinely take 10-30 s
+
+
+# One connection pool shared by crawl, 404 check and audit stages
+class HttpClient:
+    def __init__(self, limit=100, limit_per_host=8, dns_ttl=300, keepalive_timeout=30,
+                 timeout=PAGE_TIMEOUT, headers=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.stats = collections.Counter()
+        self.requests_per_host = collections.Counter()
+        self._session = None
+        self._session_loop = None
+        self._sync_session = None
+
+    # Function to build a per-request timeout object
+    def client_timeout(self, seconds=None):
+        return aiohttp.ClientTimeout(total=seconds or self.timeout)
+
+    # Function to lazily create the aiohttp session (must run inside the event loop)
+    async def session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.client_timeout(),
+                auto_decompress=True,
+                trace_configs=[self._trace_config()],
+            )
+            self._session_loop = loop
+        return self._session
+
+    # Function to lazily create a pooled requests session for the synchronous stages
+    def sync_session(self):
+        if self._sync_session is None:
+            import requests  # only the synchronous scripts need requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.limit, pool_maxsize=self.limit_per_host or self.limit)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(self.headers)
+            session.hooks['response'].append(self._count_sync_response)
+            self._sync_session = session
+        return self._sync_session
+
+    def _count_sync_response(self, response, *args, **kwargs):
+        self.stats['sync_requests'] += 1
+        self.requests_per_host[urlparse(response.url).netloc] += 1
+
+    def _trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.stats['requests'] += 1
+            self.requests_per_host[params.url.host] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.stats['connections_created'] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats['connections_reused'] += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.stats['dns_cache_hits'] += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.stats['dns_cache_misses'] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    # Function to report request, reuse and pool-occupancy figures
+    def pool_stats(self):
+        stats = dict(self.stats)
+        connector = self._session.connector if self._session is not None else None
+        if connector is not None:
+            stats['idle_connections'] = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+            stats['active_connections'] = len(getattr(connector, '_acquired', ()))
+        stats['hosts'] = len(self.requests_per_host)
+        stats['top_hosts'] = self.requests_per_host.most_common(5)
+        return stats
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._sync_session is not None:
+            self._sync_session.close()
+        self._session = None
+        self._sync_session = None
+
+
+_shared_clients = {}
+
+
+# Function to get a process-wide shared client. Stages whose traffic all goes to one host
+# (e.g. the PageSpeed API) ask for their own named pool so they get their own per-host limit.
+def get_client(name='default', **kwargs):
+    if name not in _shared_clients:
+        _shared_clients[name] = HttpClient(**kwargs)
+    return _shared_clients[name]
+
+
+# Function to close every shared client's pools
+async def close_client():
+    clients = list(_shared_clients.values())
+    _shared_clients.clear()
+    for client in clients:
+        await client.close()
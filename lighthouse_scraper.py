@@ -1,22 +1,12 @@
 import os
+import asyncio
 import subprocess
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+import tempfile
 from bs4 import BeautifulSoup
-
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-
-def setup_driver():
-    chrome_options = webdriver.ChromeOptions()
-    # Add any necessary options here
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=chrome_options)
-    return driver
+from excel_export import save_rows
+from http_client import close_client
+from report_store import ReportStore, new_run_id
+from section_harvester import harvest_section
 
 
 # Function to set up Selenium WebDriver
@@ -27,57 +17,53 @@ def setup_driver():
 #     driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
 #     return driver
 
-# Function to fetch links from the specified section
-def fetch_links_from_section(url, section_selector):
-    driver = setup_driver()
-    driver.get(url)
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    driver.quit()
-
-    sections = soup.select(section_selector)
-    url_list = []
-    if sections:
-        for section in sections:
-            links = section.find_all('a', href=True)
-            url_list.extend(link['href'] for link in links)
-        return url_list
-    else:
-        print(f"No sections found with selector: {section_selector}")
-        return []
-
-# Function to run Lighthouse and get metrics
-def run_lighthouse(url):
-    report_file = f'lighthouse_report_{url.replace("https://", "").replace("/", "_")}.html'
-    command = f'lighthouse {url} --output html --output-path {report_file} --chrome-flags="--headless"'
-
-    try:
-        subprocess.run(command, shell=True, check=True)
-        return report_file
-    except subprocess.CalledProcessError as e:
-        print(f"Error running Lighthouse for {url}: {e}")
-        return None
+# Function to fetch links from the specified section (plain HTTP first, headless render only if nothing matches)
+def fetch_links_from_section(url, section_selector, max_pages=50):
+    async def harvest():
+        try:
+            return await harvest_section(url, section_selector, max_pages=max_pages)
+        finally:
+            await close_client()
+
+    return asyncio.run(harvest())
+
+# Function to run Lighthouse and keep the report in the compressed report store
+def run_lighthouse(url, store, run_id, strategy='mobile'):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report_file = os.path.join(tmp_dir, 'report.html')
+        command = ['lighthouse', url, '--output', 'html', '--output-path', report_file,
+                   '--chrome-flags=--headless']
+        if strategy == 'desktop':
+            command.append('--preset=desktop')
+
+        try:
+            subprocess.run(command, check=True)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Error running Lighthouse for {url}: {e}")
+            return None
+        with open(report_file, 'rb') as file:
+            html = file.read()
+
+    store.put(url, html, run_id=run_id, strategy=strategy)
+    return html
 
 # Function to extract metrics from Lighthouse report
-def extract_metrics_from_report(report_file):
-    with open(report_file, 'r') as file:
-        soup = BeautifulSoup(file, 'html.parser')
+def extract_metrics_from_report(html, report_link):
+    soup = BeautifulSoup(html, 'html.parser')
 
     performance_score = float(soup.find("span", class_="lh-metric__score").text) * 100  # Example extraction
     seo_score = ...  # Extract SEO score similarly
     # Add extraction logic for other metrics as needed
 
-    report_link = f'file://{os.path.abspath(report_file)}'  # Link to the report file
-
     return {
         'Performance Score': performance_score,
         'SEO Score': seo_score,
-        'Report Link': report_link
+        'Report Link': report_link  # served by `python report_store.py serve`
     }
 
 # Function to save results to Excel
 def save_results_to_excel(results, filename):
-    df = pd.DataFrame(results)
-    df.to_excel(filename, index=False)
+    save_rows(filename, results)
 
 # Main function to coordinate everything
 def main():
@@ -87,15 +73,23 @@ def main():
     urls = fetch_links_from_section(url, section_selector)
     print(f"Fetched {len(urls)} URLs.")
 
+    store = ReportStore()
+    run_id = new_run_id()
+    strategy = 'mobile'
     results = []
     for url in urls:
         print(f"Running Lighthouse for {url}...")
-        report_file = run_lighthouse(url)
-        if report_file:
-            metrics = extract_metrics_from_report(report_file)
+        html = run_lighthouse(url, store, run_id, strategy)
+        if html:
+            metrics = extract_metrics_from_report(html, store.report_link(url, run_id, strategy))
             metrics['URL'] = url
             results.append(metrics)
 
+    # Keep 90 days of reports; blobs shared with newer runs are kept
+    store.evict(max_age_days=90)
+    print(f"Report store usage: {store.disk_usage()}")
+    store.close()
+
     output_file = 'lighthouse_results.xlsx'
     save_results_to_excel(results, output_file)
     print(f"Results saved to {output_file}.")
@@ -0,0 +1,221 @@
+import struct
+from array import array
+
+from visited_set import url_fingerprint
+
+GRAPH_MAGIC = b'LNKGRPH1'
+
+
+# Open-addressing map from 64-bit URL fingerprint to a 32-bit node ID, stored in flat arrays
+class FingerprintMap:
+    def __init__(self, capacity=1024, max_load=0.5):
+        self.max_load = max_load
+        size = 16
+        while size * max_load < capacity:
+            size *= 2
+        self._keys = array('Q', [0]) * size
+        self._values = array('I', [0]) * size
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def get(self, fingerprint):
+        keys, mask = self._keys, len(self._keys) - 1
+        i = fingerprint & mask
+        while True:
+            key = keys[i]
+            if key == fingerprint:
+                return self._values[i]
+            if key == 0:
+                return None
+            i = (i + 1) & mask
+
+    def put(self, fingerprint, value):
+        if (self._count + 1) > self.max_load * len(self._keys):
+            self._grow()
+        if self._insert(self._keys, self._values, fingerprint, value):
+            self._count += 1
+
+    @staticmethod
+    def _insert(keys, values, fingerprint, value):
+        mask = len(keys) - 1
+        i = fingerprint & mask
+        while True:
+            key = keys[i]
+            if key == 0 or key == fingerprint:
+                keys[i] = fingerprint
+                values[i] = value
+                return key == 0
+            i = (i + 1) & mask
+
+    def _grow(self):
+        old_keys, old_values = self._keys, self._values
+        size = len(old_keys) * 2
+        self._keys = array('Q', [0]) * size
+        self._values = array('I', [0]) * size
+        for key, value in zip(old_keys, old_values):
+            if key:
+                self._insert(self._keys, self._values, key, value)
+
+
+# Function to build CSR offsets/targets from parallel edge arrays
+def build_csr(sources, targets, node_count):
+    offsets = array('Q', [0]) * (node_count + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(node_count):
+        offsets[i + 1] += offsets[i]
+    cursor = array('Q', offsets[:-1])
+    adjacency = array('I', [0]) * len(sources)
+    for source, target in zip(sources, targets):
+        adjacency[cursor[source]] = target
+        cursor[source] += 1
+    return offsets, adjacency
+
+
+# Link graph built during the crawl: interned URL IDs, edge lists, CSR adjacency in both directions
+class LinkGraph:
+    def __init__(self, capacity=1024):
+        self._ids = FingerprintMap(capacity)
+        self._url_data = bytearray()
+        self._url_offsets = array('Q', [0])
+        self._depth = array('i')
+        self._template = array('Q')
+        self._edge_src = array('I')
+        self._edge_dst = array('I')
+        self._csr = None
+
+    def __len__(self):
+        return len(self._depth)
+
+    @property
+    def edge_count(self):
+        return len(self._edge_src)
+
+    # Function to return the node ID of a URL, adding it if it is new
+    def intern(self, url):
+        fingerprint = url_fingerprint(url)
+        node = self._ids.get(fingerprint)
+        if node is None:
+            node = len(self._depth)
+            self._ids.put(fingerprint, node)
+            self._url_data += url.encode('utf-8')
+            self._url_offsets.append(len(self._url_data))
+            self._depth.append(-1)
+            self._template.append(0)
+        return node
+
+    def node_id(self, url):
+        return self._ids.get(url_fingerprint(url))
+
+    def url_of(self, node):
+        return self._url_data[self._url_offsets[node]:self._url_offsets[node + 1]].decode('utf-8')
+
+    # Function to add URLs known from outside the crawl (sitemap, input sheet) without any links,
+    # so the ones no crawled page links to show up in orphans()
+    def add_known(self, urls):
+        for url in urls:
+            self.intern(url)
+
+    # Function to tell whether a URL was admitted to the crawl (it has a depth), so the crawler
+    # can use the graph's fingerprint table as its visited set
+    def visited(self, url):
+        node = self.node_id(url)
+        return node is not None and self._depth[node] >= 0
+
+    def record_depth(self, url, depth):
+        node = self.intern(url)
+        if self._depth[node] < 0:
+            self._depth[node] = depth
+
+    def record_link(self, source, target):
+        if source != target:
+            self._edge_src.append(self.intern(source))
+            self._edge_dst.append(self.intern(target))
+            self._csr = None
+
+    def record_template(self, url, signature):
+        self._template[self.intern(url)] = int(signature, 16)
+
+    def depth(self, url):
+        node = self.node_id(url)
+        if node is None or self._depth[node] < 0:
+            return None
+        return self._depth[node]
+
+    def template(self, url):
+        node = self.node_id(url)
+        if node is None or not self._template[node]:
+            return None
+        return f"{self._template[node]:016x}"
+
+    def _adjacency(self):
+        if self._csr is None:
+            count = len(self)
+            out_offsets, out_targets = build_csr(self._edge_src, self._edge_dst, count)
+            in_offsets, in_sources = build_csr(self._edge_dst, self._edge_src, count)
+            self._csr = (out_offsets, out_targets, in_offsets, in_sources)
+        return self._csr
+
+    def inlinks(self, url):
+        node = self.node_id(url)
+        if node is None:
+            return 0
+        in_offsets = self._adjacency()[2]
+        return in_offsets[node + 1] - in_offsets[node]
+
+    def outlinks(self, url):
+        node = self.node_id(url)
+        if node is None:
+            return []
+        out_offsets, out_targets = self._adjacency()[:2]
+        return [self.url_of(target) for target in out_targets[out_offsets[node]:out_offsets[node + 1]]]
+
+    # Function to answer "who links to this URL"
+    def linked_from(self, url, limit=None):
+        node = self.node_id(url)
+        if node is None:
+            return []
+        in_offsets, in_sources = self._adjacency()[2:]
+        sources = in_sources[in_offsets[node]:in_offsets[node + 1]]
+        if limit is not None:
+            sources = sources[:limit]
+        return [self.url_of(source) for source in sources]
+
+    # Function to list pages nothing links to (the crawl roots are excluded). Crawled pages are
+    # only ever added as link targets, so only URLs from add_known() can be orphans.
+    def orphans(self):
+        in_offsets = self._adjacency()[2]
+        return [self.url_of(node) for node in range(len(self))
+                if in_offsets[node + 1] == in_offsets[node] and self._depth[node] != 0]
+
+    # Function to write the graph in a compact binary format
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(GRAPH_MAGIC)
+            f.write(struct.pack('<QQQ', len(self), self.edge_count, len(self._url_data)))
+            self._url_offsets.tofile(f)
+            f.write(self._url_data)
+            self._depth.tofile(f)
+            self._template.tofile(f)
+            self._edge_src.tofile(f)
+            self._edge_dst.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(GRAPH_MAGIC)) != GRAPH_MAGIC:
+                raise ValueError(f"{path} is not a link graph file")
+            nodes, edges, url_bytes = struct.unpack('<QQQ', f.read(24))
+            graph = cls(capacity=nodes)
+            graph._url_offsets = array('Q')
+            graph._url_offsets.fromfile(f, nodes + 1)
+            graph._url_data = bytearray(f.read(url_bytes))
+            graph._depth.fromfile(f, nodes)
+            graph._template.fromfile(f, nodes)
+            graph._edge_src.fromfile(f, edges)
+            graph._edge_dst.fromfile(f, edges)
+        for node in range(nodes):
+            graph._ids.put(url_fingerprint(graph.url_of(node)), node)
+        return graph
@@ -0,0 +1,117 @@
+import collections
+import hashlib
+import re
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+MIN_WORDS = 30  # shorter pages give unstable fingerprints and are never grouped
+# Text inside these elements is boilerplate or code; it would make every page of a site look alike
+SKIP_TEXT_IN = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer', 'head'}
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+# Function to collect the words a visitor sees, without modifying the soup
+def visible_words(soup):
+    words = []
+    for text in soup.find_all(string=True):
+        if any(parent.name in SKIP_TEXT_IN for parent in text.parents):
+            continue
+        words.extend(WORD.findall(text.lower()))
+    return words
+
+
+# Per-byte lookup: bit b of a byte moved into its own LANE_BITS-wide lane, so one big-int
+# addition per shingle updates all 64 bit counters at once
+LANE_BITS = 24
+LANE_MASK = (1 << LANE_BITS) - 1
+SPREAD = [sum(1 << (bit * LANE_BITS) for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+# Function to compute a 64-bit simhash over word shingles; similar texts differ in few bits
+def simhash(words, shingle_size=SHINGLE_SIZE):
+    shingles = collections.Counter(
+        ' '.join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1)))
+    lanes, total = 0, 0
+    for shingle, count in shingles.items():
+        digest = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        spread = 0
+        for position, byte in enumerate(digest):  # big-endian: the first byte holds bits 56-63
+            spread |= SPREAD[byte] << ((7 - position) * 8 * LANE_BITS)
+        lanes += spread * count
+        total += count
+    # A bit is set when more shingle weight had it set than unset
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if ((lanes >> (bit * LANE_BITS)) & LANE_MASK) * 2 > total)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+# Simhash index that groups near-duplicate pages. Fingerprints are split into max_distance + 1
+# bands, so any two within max_distance bits share at least one band exactly (pigeonhole);
+# only pages sharing a band are compared. Bands are spread evenly (64 bits over 7 bands gives
+# 9- and 10-bit bands), since one narrow band would put most groups in the same few buckets.
+class NearDuplicateIndex:
+    def __init__(self, max_distance=6, min_words=MIN_WORDS):
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.band_count = max_distance + 1
+        edges = [band * SIMHASH_BITS // self.band_count for band in range(self.band_count + 1)]
+        self.band_slices = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+        self.bands = [collections.defaultdict(list) for _ in range(self.band_count)]
+        self.canonical = []  # group id -> (url, fingerprint) of the first page seen
+        self.duplicate_of = {}  # duplicate url -> (canonical url, distance)
+        self.stats = collections.Counter()
+
+    def _band_values(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self.band_slices]
+
+    # Function to find the group of an earlier page within max_distance bits, if any
+    def find(self, fingerprint):
+        best = None
+        for band, value in enumerate(self._band_values(fingerprint)):
+            for group in self.bands[band].get(value, ()):
+                distance = hamming(fingerprint, self.canonical[group][1])
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (group, distance)
+        return best
+
+    # Function to fingerprint a parsed page; returns the canonical URL if it duplicates an earlier page
+    def add(self, url, soup):
+        words = visible_words(soup)
+        if len(words) < self.min_words:
+            self.stats['too short'] += 1
+            return None
+        fingerprint = simhash(words)
+        match = self.find(fingerprint)
+        if match is not None:
+            canonical_url = self.canonical[match[0]][0]
+            self.duplicate_of[url] = (canonical_url, match[1])
+            self.stats['duplicates'] += 1
+            return canonical_url
+        group = len(self.canonical)
+        self.canonical.append((url, fingerprint))
+        for band, value in enumerate(self._band_values(fingerprint)):
+            self.bands[band][value].append(group)
+        self.stats['unique'] += 1
+        return None
+
+    def is_duplicate(self, url):
+        return url in self.duplicate_of
+
+    # Function to map each canonical URL to its duplicates
+    def groups(self):
+        grouped = collections.OrderedDict()
+        for url, (canonical_url, _) in self.duplicate_of.items():
+            grouped.setdefault(canonical_url, []).append(url)
+        return grouped
+
+    # Function to list one report row per duplicate page
+    def report(self):
+        group_ids = {url: number for number, url in enumerate(self.groups(), 1)}
+        return [{
+            'Group': group_ids[canonical_url],
+            'Canonical URL': canonical_url,
+            'URL': url,
+            'Distance (bits)': distance,
+        } for url, (canonical_url, distance) in self.duplicate_of.items()]
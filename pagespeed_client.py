@@ -0,0 +1,232 @@
+import asyncio
+import collections
+import json
+import logging
+import time
+from urllib.parse import urlencode
+
+import aiohttp
+
+from http_client import get_client, API_TIMEOUT
+from retry_policy import get_policy, CircuitOpenError, RetryableError, RETRY_STATUSES
+from structured_logging import log_url
+
+logger = logging.getLogger(__name__)
+
+PSI_ENDPOINT = 'https://www.googleapis.com/pagespeedonline/v5/runPagespeed'
+REPORT_VIEWER = 'https://pagespeed.web.dev/analysis'
+DEFAULT_CATEGORIES = ('performance', 'seo')
+METRIC_AUDITS = ('first-contentful-paint', 'largest-contentful-paint', 'total-blocking-time',
+                 'speed-index', 'cumulative-layout-shift')
+# Only the scores and metric values extract_metrics reads; the full response carries
+# screenshots and every audit and is several MB
+DEFAULT_FIELDS = ','.join(
+    ['id', 'lighthouseResult/runtimeError', 'lighthouseResult/categories/*/score']
+    + [f'lighthouseResult/audits/{audit}/numericValue' for audit in METRIC_AUDITS])
+# Google APIs only gzip responses for clients that say so in both headers
+GZIP_HEADERS = {'Accept-Encoding': 'gzip', 'User-Agent': 'site-audit (gzip)'}
+PER_MINUTE_QUOTA = 240  # PageSpeed Insights default per key
+PER_DAY_QUOTA = 25000
+PSI_CONNECTIONS = 100  # every audit goes to googleapis.com; the semaphore sets the real concurrency
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+# Function to split a comma-separated key string (or pass a list through)
+def parse_api_keys(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [key.strip() for key in value if key and key.strip()]
+
+
+# Function to build the clickable PageSpeed report link for a page
+def report_link(url, strategy):
+    return f"{REPORT_VIEWER}?{urlencode({'url': url, 'form_factor': strategy})}"
+
+
+# Function to extract relevant metrics from the API results
+def extract_metrics(data, url):
+    try:
+        lighthouse_data = data.get('lighthouseResult', {})
+        performance_score = lighthouse_data.get('categories', {}).get('performance', {}).get('score', 0) * 100
+        seo_score = lighthouse_data.get('categories', {}).get('seo', {}).get('score', None)
+        if seo_score is not None:
+            seo_score *= 100
+        pwa_score = lighthouse_data.get('categories', {}).get('pwa', {}).get('score', None)
+        if pwa_score is not None:
+            pwa_score *= 100
+
+        core_web_vitals = lighthouse_data.get('audits', {})
+        load_time = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
+        fcp = core_web_vitals.get('first-contentful-paint', {}).get('numericValue', 0) / 1000
+        lcp = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
+        ttb = core_web_vitals.get('total-blocking-time', {}).get('numericValue', 0) / 1000
+        speed_index = core_web_vitals.get('speed-index', {}).get('numericValue', 0) / 1000
+        cls = core_web_vitals.get('cumulative-layout-shift', {}).get('numericValue', 0)
+
+        return {
+            'URL': url,
+            'Performance Score': performance_score,
+            'SEO Score': seo_score,
+            'PWA Score': pwa_score,
+            'Load Time (seconds)': load_time,
+            'First Contentful Paint (seconds)': fcp,
+            'Largest Contentful Paint (seconds)': lcp,
+            'Total Blocking Time (seconds)': ttb,
+            'Speed Index (seconds)': speed_index,
+            'Cumulative Layout Shift (CLS)': cls,
+            'Status': 'Success'
+        }
+    except (KeyError, TypeError) as e:
+        log_url(logger, logging.ERROR, "Error extracting metrics", url, error=str(e))
+        return {'URL': url, 'Status': 'Failed'}
+
+
+# Per-key request counters: a one-minute sliding window, a daily total and a cooldown after 429s
+class ApiKey:
+    def __init__(self, key, per_minute=PER_MINUTE_QUOTA, per_day=PER_DAY_QUOTA):
+        self.key = key
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.recent = collections.deque()
+        self.day_started = time.monotonic()
+        self.used_today = 0
+        self.cooldown_until = 0.0
+        self.disabled = False
+        self.stats = collections.Counter()
+
+    def label(self):
+        return f"...{self.key[-4:]}" if self.key else 'no key'
+
+    # Function to return how long until this key may be used, or None if it is done for the day
+    def wait_time(self, now):
+        if now - self.day_started >= 86400:
+            self.day_started, self.used_today = now, 0
+        if self.disabled or self.used_today >= self.per_day:
+            return None
+        while self.recent and now - self.recent[0] >= 60:
+            self.recent.popleft()
+        wait = max(0.0, self.cooldown_until - now)
+        if len(self.recent) >= self.per_minute:
+            wait = max(wait, 60 - (now - self.recent[0]))
+        return wait
+
+    def record(self, now):
+        self.recent.append(now)
+        self.used_today += 1
+        self.stats['requests'] += 1
+
+
+# Rotates across API keys, always picking the least-used key that has quota left
+class ApiKeyPool:
+    def __init__(self, keys, per_minute=PER_MINUTE_QUOTA, per_day=PER_DAY_QUOTA):
+        # Without keys the API still answers, at a much lower anonymous quota
+        self.keys = [ApiKey(key, per_minute, per_day) for key in parse_api_keys(keys) or [None]]
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                waits = [(wait, len(key.recent), key) for key in self.keys
+                         if (wait := key.wait_time(now)) is not None]
+                if not waits:
+                    raise QuotaExhausted("All PageSpeed API keys are invalid or out of daily quota")
+                wait, _, key = min(waits, key=lambda item: item[:2])
+                if wait <= 0:
+                    key.record(now)
+                    return key
+                await asyncio.sleep(wait)
+
+    # Function to back off a key after a 429, honouring Retry-After when present
+    def throttled(self, key, retry_after=None):
+        key.stats['throttled'] += 1
+        key.cooldown_until = time.monotonic() + (retry_after or 60)
+
+    def reject(self, key, reason):
+        key.stats['rejected'] += 1
+        key.disabled = True
+        logger.error(f"Disabling PageSpeed API key {key.label()}: {reason}")
+
+    def stats(self):
+        return {key.label(): dict(key.stats, today=key.used_today, disabled=key.disabled) for key in self.keys}
+
+
+# PageSpeed Insights client: masked, gzipped responses, explicit categories and key rotation
+class PageSpeedClient:
+    def __init__(self, api_keys, strategy='desktop', categories=DEFAULT_CATEGORIES, fields=DEFAULT_FIELDS,
+                 semaphore=None, concurrency=10, retries=3, client=None, policy=None):
+        self.keys = api_keys if isinstance(api_keys, ApiKeyPool) else ApiKeyPool(api_keys)
+        self.strategy = strategy
+        self.categories = tuple(categories)
+        self.fields = fields
+        self.semaphore = semaphore or asyncio.Semaphore(concurrency)
+        self.retries = retries
+        # Its own pool: the shared pool's per-host limit would cap audits at 8 in flight
+        self.client = client or get_client('pagespeed', limit=PSI_CONNECTIONS, limit_per_host=0)
+        self.policy = policy or get_policy()
+        self.stats = collections.Counter()
+
+    def _params(self, url, strategy, key):
+        params = [('url', url), ('strategy', strategy)]
+        if key.key:
+            params.append(('key', key.key))
+        params += [('category', category) for category in self.categories]
+        if self.fields:
+            params.append(('fields', self.fields))
+        return params
+
+    def _failed(self, url, strategy):
+        self.stats['failed'] += 1
+        return {'URL': url, 'Status': 'Failed', 'Report Link': report_link(url, strategy)}
+
+    async def _request(self, session, url, strategy, timeout):
+        key = await self.keys.acquire()
+        async with session.get(PSI_ENDPOINT, params=self._params(url, strategy, key),
+                               headers=GZIP_HEADERS, timeout=timeout) as response:
+            if response.status == 200:
+                self.stats['wire bytes'] += response.content_length or 0
+                body = await response.read()
+                self.stats['bytes'] += len(body)
+                self.stats['success'] += 1
+                metrics = extract_metrics(json.loads(body), url)
+                metrics['Report Link'] = report_link(url, strategy)
+                return metrics
+            response_text = await response.text()
+            if response.status == 429:
+                retry_after = response.headers.get('Retry-After')
+                self.keys.throttled(key, float(retry_after) if retry_after and retry_after.isdigit() else None)
+                log_url(logger, logging.WARNING, "PageSpeed quota hit, rotating key", url, key=key.label())
+                raise RetryableError("PageSpeed quota hit", 429, host_failure=False)
+            if response.status in (400, 403) and 'API key' in response_text:
+                self.keys.reject(key, response_text[:200])
+                raise RetryableError("PageSpeed API key rejected", response.status, host_failure=False)
+            if response.status in RETRY_STATUSES:
+                log_url(logger, logging.WARNING, "PageSpeed server error", url, status=response.status)
+                raise RetryableError("PageSpeed server error", response.status)
+            log_url(logger, logging.ERROR, "Error fetching PageSpeed data", url,
+                    status=response.status, body=response_text[:500])
+            return self._failed(url, strategy)
+
+    # Function to audit one URL; keys never end up in results or logs
+    async def audit(self, url, strategy=None):
+        strategy = strategy or self.strategy
+        timeout = self.client.client_timeout(API_TIMEOUT)
+        async with self.semaphore:
+            session = await self.client.session()
+            try:
+                # PSI 5xx mostly mean Lighthouse could not load the page, so the breaker is keyed on
+                # the audited site rather than on googleapis.com
+                return await self.policy.call(url, self._request, session, url, strategy, timeout,
+                                              attempts=self.retries)
+            except CircuitOpenError:
+                log_url(logger, logging.WARNING, "Host circuit open, skipping audit", url)
+            except QuotaExhausted as e:
+                log_url(logger, logging.ERROR, str(e), url)
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableError) as e:
+                log_url(logger, logging.ERROR, "Failed to fetch PageSpeed data", url, error=str(e))
+            return self._failed(url, strategy)
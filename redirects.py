@@ -0,0 +1,188 @@
+import asyncio
+import collections
+import logging
+from urllib.parse import urlsplit, urljoin
+
+from http_client import get_client, PAGE_TIMEOUT
+from retry_policy import get_policy, raise_for_retry, RetryableError
+from structured_logging import log_url
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+# Function to label a resolved chain the same way check_404 does
+def classify(final_status):
+    if final_status is None:
+        return "Error checking URL"
+    if final_status == 404:
+        return "Redirects to 404"
+    return "Pass"
+
+
+# Follows redirects hop by hop, caching redirect hops so shared prefixes are fetched once
+class RedirectResolver:
+    def __init__(self, client=None, max_hops=10, concurrency=20, learn_origin_rules=True, rule_threshold=3,
+                 policy=None, max_cached_hops=100000):
+        self.client = client or get_client()
+        self.policy = policy or get_policy()
+        self.max_hops = max_hops
+        self.concurrency = concurrency
+        self.learn_origin_rules = learn_origin_rules
+        self.rule_threshold = rule_threshold
+        self.max_cached_hops = max_cached_hops
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._hops = {}  # url -> (status, location), redirects only; oldest evicted first
+        self._pending = {}  # url -> Future for hops currently being fetched
+        self._origin_moves = collections.Counter()  # (from origin, to origin) -> times seen
+        self._origin_rules = {}  # from origin -> to origin, applied without a request
+        self.stats = collections.Counter()
+
+    # Function to fetch one hop without following it, sharing in-flight requests
+    async def _fetch_hop(self, url):
+        if url in self._hops:
+            self.stats['hop_cache_hits'] += 1
+            return self._hops[url]
+        if url in self._pending:
+            self.stats['hop_cache_hits'] += 1
+            return await self._pending[url]
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[url] = future
+        try:
+            async with self._semaphore:
+                try:
+                    hop = await self.policy.call(url, self._request_hop, url)
+                except RetryableError as e:
+                    hop = (e.status, None)  # still failing after the retries; keep the last status
+            self.stats['hop_requests'] += 1
+            # Terminal hops are reached by one URL each; only redirects are shared between URLs
+            if hop[0] in REDIRECT_STATUSES and hop[1]:
+                if len(self._hops) >= self.max_cached_hops:
+                    del self._hops[next(iter(self._hops))]
+                self._hops[url] = hop
+            future.set_result(hop)
+            return hop
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be awaiting this future; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            del self._pending[url]
+
+    async def _request_hop(self, url):
+        session = await self.client.session()
+        async with session.get(url, allow_redirects=False,
+                               timeout=self.client.client_timeout(PAGE_TIMEOUT)) as response:
+            raise_for_retry(response.status, response.headers.get('Retry-After'))
+            location = response.headers.get('Location')
+            return response.status, urljoin(url, location) if location else None
+
+    # Function to learn origin-wide moves such as http->https or apex->www
+    def _learn(self, url, target):
+        source, dest = urlsplit(url), urlsplit(target)
+        if (source.path, source.query) != (dest.path, dest.query):
+            return
+        from_origin = (source.scheme, source.netloc)
+        to_origin = (dest.scheme, dest.netloc)
+        if from_origin == to_origin:
+            return
+        self._origin_moves[from_origin, to_origin] += 1
+        if self._origin_moves[from_origin, to_origin] >= self.rule_threshold:
+            self._origin_rules[from_origin] = to_origin
+
+    def _apply_rule(self, url):
+        parts = urlsplit(url)
+        to_origin = self._origin_rules.get((parts.scheme, parts.netloc))
+        if to_origin is None:
+            return None
+        return parts._replace(scheme=to_origin[0], netloc=to_origin[1]).geturl()
+
+    # Function to resolve a URL to its final target, recording every hop
+    async def resolve(self, url):
+        chain = []
+        current = url
+        seen = set()
+        try:
+            for _ in range(self.max_hops + 1):
+                if current in seen:
+                    log_url(logger, logging.WARNING, "Redirect loop", url, chain=chain)
+                    return self._result(url, chain, current, None)
+                seen.add(current)
+
+                if self.learn_origin_rules:
+                    rewritten = self._apply_rule(current)
+                    if rewritten is not None:
+                        self.stats['origin_rule_hits'] += 1
+                        chain.append((current, 301))
+                        current = rewritten
+                        continue
+
+                status, location = await self._fetch_hop(current)
+                if status in REDIRECT_STATUSES and location:
+                    chain.append((current, status))
+                    if self.learn_origin_rules:
+                        self._learn(current, location)
+                    current = location
+                    continue
+                return self._result(url, chain, current, status)
+            log_url(logger, logging.WARNING, "Too many redirects", url, hops=len(chain))
+            return self._result(url, chain, current, None)
+        except Exception as e:
+            log_url(logger, logging.ERROR, "Error occurred while resolving URL", url, error=str(e))
+            return self._result(url, chain, current, None)
+
+    @staticmethod
+    def _result(url, chain, final_url, final_status):
+        return {
+            'URL': url,
+            'Final URL': final_url,
+            'Final Status': final_status,
+            'Hops': len(chain),
+            'Redirect Chain': ' -> '.join(f"{hop} [{status}]" for hop, status in chain),
+            'Status': classify(final_status),
+        }
+
+    # Function to stream resolved rows, pulling URLs lazily from any iterable through a fixed
+    # pool of workers, so memory stays flat however many URLs the crawl produced
+    async def iter_resolved(self, urls, workers=None):
+        source = iter(urls)
+        results = asyncio.Queue(maxsize=self.concurrency)
+
+        async def worker():
+            try:
+                for url in source:
+                    await results.put(await self.resolve(url))
+            except Exception as e:
+                await results.put(e)
+            await results.put(None)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers or self.concurrency)]
+        finished = 0
+        try:
+            while finished < len(tasks):
+                row = await results.get()
+                if row is None:
+                    finished += 1
+                elif isinstance(row, Exception):
+                    raise row
+                else:
+                    yield row
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # Function to resolve many URLs and return every row
+    async def resolve_all(self, urls):
+        return [row async for row in self.iter_resolved(urls)]
+
+
+# Function to group requested URLs by the page they finally land on
+def group_by_final_url(resolved):
+    groups = collections.OrderedDict()
+    for row in resolved:
+        if row['Status'] == "Pass":
+            groups.setdefault(row['Final URL'], []).append(row['URL'])
+    return groups
@@ -0,0 +1,194 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse, parse_qs
+
+DEFAULT_ROOT = 'reports'
+DEFAULT_PORT = 8765
+# Inline <script>/<style> bodies above this size are stored as shared blobs; the Lighthouse
+# renderer is identical across reports, so it is kept on disk exactly once
+SHARED_BLOCK_MIN = 4096
+BLOCK_PATTERN = re.compile(rb'(<(script|style)\b[^>]*>)(.*?)(</\2>)', re.DOTALL | re.IGNORECASE)
+
+
+# Compressed, content-addressed store for Lighthouse HTML reports with a SQLite index
+class ReportStore:
+    def __init__(self, root=DEFAULT_ROOT, base_url=f"http://127.0.0.1:{DEFAULT_PORT}"):
+        self.root = root
+        self.base_url = base_url
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS reports (
+                url TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                manifest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (url, run_id, strategy)
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS reports_by_time ON reports (created_at)")
+        self.db.commit()
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:] + '.gz')
+
+    # Function to write a blob once, keyed by the SHA-256 of its content
+    def _put_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _get_blob(self, digest):
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+    # Function to split a report into literal text and shared script/style blobs
+    def _manifest(self, html):
+        parts, position = [], 0
+        for match in BLOCK_PATTERN.finditer(html):
+            body = match.group(3)
+            if len(body) < SHARED_BLOCK_MIN:
+                continue
+            parts.append(['text', self._put_blob(html[position:match.start(3)])])
+            parts.append(['blob', self._put_blob(body)])
+            position = match.end(3)
+        parts.append(['text', self._put_blob(html[position:])])
+        return json.dumps(parts).encode('utf-8')
+
+    # Function to store a report and index it by URL, run and strategy
+    def put(self, url, html, run_id, strategy='desktop'):
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        manifest = self._put_blob(self._manifest(html))
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                            (url, run_id, strategy, time.time(), manifest, len(html)))
+        return manifest
+
+    def lookup(self, url, run_id=None, strategy='desktop'):
+        query = "SELECT manifest FROM reports WHERE url = ? AND strategy = ?"
+        args = [url, strategy]
+        if run_id is not None:
+            query += " AND run_id = ?"
+            args.append(run_id)
+        row = self.db.execute(query + " ORDER BY created_at DESC LIMIT 1", args).fetchone()
+        return row[0] if row else None
+
+    # Function to rebuild the original report bytes
+    def get(self, url, run_id=None, strategy='desktop'):
+        manifest = self.lookup(url, run_id, strategy)
+        if manifest is None:
+            return None
+        parts = json.loads(self._get_blob(manifest))
+        return b''.join(self._get_blob(digest) for _, digest in parts)
+
+    # Function to build the spreadsheet link; it resolves through the index via `serve`
+    def report_link(self, url, run_id, strategy='desktop'):
+        return f"{self.base_url}/report?{urlencode({'url': url, 'run': run_id, 'strategy': strategy})}"
+
+    # Function to drop reports past the retention window and delete blobs nobody references
+    def evict(self, max_age_days=None, keep_runs=None):
+        with self.db:
+            if max_age_days is not None:
+                self.db.execute("DELETE FROM reports WHERE created_at < ?", (time.time() - max_age_days * 86400,))
+            if keep_runs is not None:
+                self.db.execute("""
+                    DELETE FROM reports WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (
+                                PARTITION BY url, strategy ORDER BY created_at DESC) AS rank
+                            FROM reports)
+                        WHERE rank > ?)""", (keep_runs,))
+        return self.collect_garbage()
+
+    def collect_garbage(self):
+        live = set()
+        for (manifest,) in self.db.execute("SELECT DISTINCT manifest FROM reports"):
+            live.add(manifest)
+            live.update(digest for _, digest in json.loads(self._get_blob(manifest)))
+        removed = 0
+        objects = os.path.join(self.root, 'objects')
+        for prefix in os.listdir(objects):
+            for name in os.listdir(os.path.join(objects, prefix)):
+                if name.endswith('.gz') and prefix + name[:-3] not in live:
+                    os.remove(os.path.join(objects, prefix, name))
+                    removed += 1
+        return removed
+
+    def disk_usage(self):
+        total = 0
+        for directory, _, files in os.walk(os.path.join(self.root, 'objects')):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        original = self.db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM reports").fetchone()
+        return {'reports': original[1], 'original bytes': original[0], 'stored bytes': total}
+
+    def close(self):
+        self.db.close()
+
+
+# Function to make a run ID from the current time, e.g. 20241028-155039
+def new_run_id():
+    return datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+
+
+# Function to serve stored reports so spreadsheet links open in a browser
+def serve(store, port=DEFAULT_PORT):
+    class ReportHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            request = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(request.query).items()}
+            html = None
+            if request.path == '/report' and 'url' in params:
+                html = store.get(params['url'], params.get('run'), params.get('strategy', 'desktop'))
+            if html is None:
+                self.send_error(404, "Report not found")
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(html)))
+            self.end_headers()
+            self.wfile.write(html)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), ReportHandler)
+    print(f"Serving reports from {store.root} at http://127.0.0.1:{port}/report")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lighthouse report store")
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="serve reports for the spreadsheet links")
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    evict_parser = commands.add_parser('evict', help="apply retention and delete unreferenced blobs")
+    evict_parser.add_argument('--max-age-days', type=float)
+    evict_parser.add_argument('--keep-runs', type=int)
+    commands.add_parser('usage', help="show stored vs original size")
+    args = parser.parse_args()
+
+    store = ReportStore(args.root)
+    if args.command == 'serve':
+        serve(store, args.port)
+    elif args.command == 'evict':
+        print(f"Removed {store.evict(args.max_age_days, args.keep_runs)} unreferenced blobs")
+    else:
+        print(store.disk_usage())
+
+
+if __name__ == "__main__":
+    main()
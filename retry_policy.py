@@ -0,0 +1,206 @@
+import asyncio
+import collections
+import logging
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+# Raised by a request function for a response worth retrying (429 or 5xx)
+class RetryableError(Exception):
+    def __init__(self, message, status=None, retry_after=None, host_failure=True):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.host_failure = host_failure  # False for per-key quota errors that say nothing about the host
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# Function to raise RetryableError for a retryable status, passing anything else through
+def raise_for_retry(status, retry_after=None):
+    if status in RETRY_STATUSES:
+        if retry_after is not None and not str(retry_after).isdigit():
+            retry_after = None
+        raise RetryableError(f"HTTP {status}", status, float(retry_after) if retry_after else None)
+    return status
+
+
+def _transient_errors():
+    errors = [RetryableError, OSError, asyncio.TimeoutError, TimeoutError]
+    # Only the HTTP libraries a caller has already imported are checked
+    for module, name in (('aiohttp', 'ClientError'), ('requests', 'RequestException')):
+        if module in sys.modules:
+            errors.append(getattr(sys.modules[module], name))
+    return tuple(errors)
+
+
+# Per-host breaker: opens after consecutive failures, then lets one probe through after a cool-off
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_seconds=30, max_reset_seconds=300):
+        self.failure_threshold = failure_threshold
+        self.base_reset = reset_seconds
+        self.max_reset = max_reset_seconds
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.open_until = 0.0
+
+    def allow(self, now):
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and now >= self.open_until:
+            self.state = 'half-open'  # this caller is the probe; everyone else still fails fast
+            return True
+        return False
+
+    # Function to hand the probe slot back when a call ends without a verdict (e.g. cancelled)
+    def release(self):
+        if self.state == 'half-open':
+            self.state = 'open'
+            self.open_until = 0.0
+
+    def success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.reset_seconds = self.base_reset
+
+    def failure(self, now):
+        self.failures += 1
+        if self.state == 'half-open':
+            self.reset_seconds = min(self.reset_seconds * 2, self.max_reset)
+        elif self.failures < self.failure_threshold:
+            return False
+        self.state = 'open'
+        self.open_until = now + self.reset_seconds
+        return True
+
+
+# Run-wide cap on retries: a fixed allowance plus a fraction of all requests made
+class RetryBudget:
+    def __init__(self, ratio=0.2, min_retries=50):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+
+    def record_request(self):
+        self.requests += 1
+
+    def allow_retry(self):
+        if self.retries >= self.min_retries + self.ratio * self.requests:
+            return False
+        self.retries += 1
+        return True
+
+
+# Shared retry policy for every network stage: jittered backoff, retry budget and host breakers
+class RetryPolicy:
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=10.0, budget=None,
+                 failure_threshold=5, reset_seconds=30):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.breakers = {}
+        self.stats = collections.Counter()
+
+    def breaker(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return self.breakers[host]
+
+    # Function to pick a delay with full jitter, so failed callers do not retry in lockstep
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    def _admit(self, url, breaker):
+        if not breaker.allow(time.monotonic()):
+            self.stats['shed'] += 1
+            raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+        self.budget.record_request()
+
+    # Function to record a failure and return the delay before the next attempt, or re-raise
+    def _failed(self, url, breaker, error, attempt, attempts, deadline):
+        if getattr(error, 'host_failure', True) and breaker.failure(time.monotonic()):
+            self.stats['circuits opened'] += 1
+            logger.warning(f"Circuit opened for {urlsplit(url).netloc} after {breaker.failures} failures; "
+                           f"shedding requests for {breaker.reset_seconds:.0f}s")
+        if attempt + 1 >= attempts:
+            raise error
+        delay = self.backoff(attempt, getattr(error, 'retry_after', None))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise error
+        if not self.budget.allow_retry():
+            self.stats['budget exhausted'] += 1
+            raise error
+        self.stats['retries'] += 1
+        return delay
+
+    # Function to call an async request function for url under the policy
+    async def call(self, url, func, *args, attempts=None, deadline=None, **kwargs):
+        attempts = attempts or self.attempts
+        breaker = self.breaker(url)
+        transient = _transient_errors()
+        for attempt in range(attempts):
+            self._admit(url, breaker)
+            try:
+                result = await func(*args, **kwargs)
+            except transient as e:
+                await asyncio.sleep(self._failed(url, breaker, e, attempt, attempts, deadline))
+                continue
+            except Exception:
+                breaker.success()  # the host answered; the caller's own error is not a host failure
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.success()
+            return result
+
+    # Function to call a blocking request function for url under the policy
+    def call_sync(self, url, func, *args, attempts=None, deadline=None, **kwargs):
+        attempts = attempts or self.attempts
+        breaker = self.breaker(url)
+        transient = _transient_errors()
+        for attempt in range(attempts):
+            self._admit(url, breaker)
+            try:
+                result = func(*args, **kwargs)
+            except transient as e:
+                time.sleep(self._failed(url, breaker, e, attempt, attempts, deadline))
+                continue
+            except Exception:
+                breaker.success()  # the host answered; the caller's own error is not a host failure
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.success()
+            return result
+
+    def summary(self):
+        return dict(self.stats, open_hosts=[host for host, breaker in self.breakers.items()
+                                            if breaker.state != 'closed'])
+
+
+_policy = None
+
+
+# Function to get the process-wide policy, so the retry budget and breakers are shared
+def get_policy():
+    global _policy
+    if _policy is None:
+        _policy = RetryPolicy()
+    return _policy
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import re
+import threading
+from urllib.parse import urljoin, urldefrag
+
+from bs4 import BeautifulSoup
+
+from driver_cache import chromedriver_path
+from html_fetcher import fetch_html
+from http_client import get_client, PAGE_TIMEOUT
+from retry_policy import get_policy, raise_for_retry
+from structured_logging import log_url
+
+logger = logging.getLogger(__name__)
+
+PAGINATION_SELECTOR = 'a[rel=next], link[rel=next], .pagination a[href], a.page-numbers, a.page-link'
+PAGE_NUMBER_PATTERN = re.compile(r'(/page/|[?&](?:page|p)=)(\d+)')
+
+# Resource patterns blocked in the render fallback; only the DOM matters here
+BLOCKED_RESOURCES = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg', '*.wav', '*.avi', '*.mov',
+]
+
+
+# Function to create a headless Chrome that skips images, fonts and media
+def create_render_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.media_stream': 2,
+    })
+    driver = webdriver.Chrome(service=ChromeService(chromedriver_path()), options=chrome_options)
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCES})
+    driver.set_page_load_timeout(30)
+    return driver
+
+
+# Small pool of reusable render drivers; drivers are only started when first needed
+class RenderPool:
+    def __init__(self, size=2):
+        self.size = size
+        self._idle = []
+        self._created = 0
+        self._all = []
+        self._available = threading.Condition()
+
+    def _acquire(self):
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            driver = create_render_driver()
+        except BaseException:
+            # Give the slot back and wake a waiter so it can try to start a driver itself
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+        with self._available:
+            self._all.append(driver)
+        return driver
+
+    def _release(self, driver):
+        with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+
+    def render(self, url):
+        driver = self._acquire()
+        try:
+            driver.get(url)
+            return driver.page_source
+        finally:
+            self._release(driver)
+
+    async def render_async(self, url):
+        return await asyncio.get_running_loop().run_in_executor(None, self.render, url)
+
+    def close(self):
+        with self._available:
+            drivers, self._all, self._idle = self._all, [], []
+            self._created = 0
+        for driver in drivers:
+            driver.quit()
+
+
+# Function to pull absolute link targets out of every element matching the selector
+def links_in_sections(soup, base_url, section_selector):
+    url_list = []
+    for section in soup.select(section_selector):
+        anchors = [section] if section.name == 'a' and section.has_attr('href') else section.find_all('a', href=True)
+        for link in anchors:
+            url_list.append(urldefrag(urljoin(base_url, link['href']))[0])
+    return url_list
+
+
+# Function to find pagination pages, expanding /page/N or ?page=N ranges up to max_pages
+def pagination_links(soup, base_url, max_pages):
+    pages = set()
+    for link in soup.select(PAGINATION_SELECTOR):
+        href = link.get('href')
+        if href:
+            pages.add(urldefrag(urljoin(base_url, href))[0])
+
+    highest, template = 0, None
+    for page in pages:
+        match = PAGE_NUMBER_PATTERN.search(page)
+        if match and int(match.group(2)) > highest:
+            highest, template = int(match.group(2)), (page, match)
+    if template is not None:
+        page, match = template
+        for number in range(2, min(highest, max_pages) + 1):
+            pages.add(page[:match.start(2)] + str(number) + page[match.end(2):])
+    return pages
+
+
+# Harvests section links over a listing and its pagination, rendering only when needed
+class SectionHarvester:
+    def __init__(self, section_selector, max_pages=50, render_fallback=True, render_pool=None):
+        self.section_selector = section_selector
+        self.max_pages = max_pages
+        self.render_fallback = render_fallback
+        self.render_pool = render_pool
+        self.client = get_client()
+
+    async def _fetch(self, url):
+        async def fetch():
+            session = await self.client.session()
+            result = await fetch_html(session, url, timeout=self.client.client_timeout(PAGE_TIMEOUT))
+            raise_for_retry(result.status)
+            return result
+
+        result = await get_policy().call(url, fetch)
+        if result.html is None:
+            log_url(logger, logging.WARNING, "Failed to retrieve listing page", url,
+                    status=result.status, reason=result.skipped)
+        return result.html
+
+    async def harvest_page(self, url):
+        try:
+            html = await self._fetch(url)
+        except Exception as e:
+            log_url(logger, logging.ERROR, "Error occurred while fetching listing page", url, error=str(e))
+            html = None
+        soup = BeautifulSoup(html, 'html.parser') if html else None
+        links = links_in_sections(soup, url, self.section_selector) if soup else []
+
+        # Render only a page that loaded but had no matches; a 404, 5xx or open circuit won't render either
+        if soup is not None and not links and self.render_fallback:
+            if self.render_pool is None:
+                self.render_pool = RenderPool()
+            log_url(logger, logging.INFO, "No server-rendered matches, rendering", url)
+            try:
+                rendered = BeautifulSoup(await self.render_pool.render_async(url), 'html.parser')
+            except Exception as e:
+                log_url(logger, logging.ERROR, "Error occurred while rendering listing page", url, error=str(e))
+            else:
+                soup = rendered
+                links = links_in_sections(soup, url, self.section_selector)
+        return links, soup
+
+    # Function to harvest the start page, then every pagination page in concurrent waves
+    async def harvest(self, start_url):
+        seen_pages = {start_url}
+        wave = [start_url]
+        url_list, seen_links = [], set()
+
+        while wave:
+            pages = await asyncio.gather(*(self.harvest_page(page) for page in wave))
+            next_wave = []
+            for page, (links, soup) in zip(wave, pages):
+                for link in links:
+                    if link not in seen_links:
+                        seen_links.add(link)
+                        url_list.append(link)
+                if soup is None:
+                    continue
+                for next_page in pagination_links(soup, page, self.max_pages):
+                    if next_page not in seen_pages and len(seen_pages) < self.max_pages:
+                        seen_pages.add(next_page)
+                        next_wave.append(next_page)
+            wave = next_wave
+
+        if not url_list:
+            logger.warning("No sections found with selector",
+                           extra={'fields': {'url': start_url, 'selector': self.section_selector,
+                                             'pages': len(seen_pages)}})
+        return url_list
+
+    def close(self):
+        if self.render_pool is not None:
+            self.render_pool.close()
+
+
+# Function to harvest links from a section selector across a listing and its pagination
+async def harvest_section(url, section_selector, max_pages=50, render_fallback=True):
+    harvester = SectionHarvester(section_selector, max_pages=max_pages, render_fallback=render_fallback)
+    try:
+        return await harvester.harvest(url)
+    finally:
+        harvester.close()
@@ -0,0 +1,201 @@
+import asyncio
+import collections
+import logging
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from http_client import get_client, HttpClient, PAGE_TIMEOUT
+from redirects import classify as status_label
+from retry_policy import get_policy, raise_for_retry, CircuitOpenError, RetryableError
+from structured_logging import log_url, ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+
+# Function to tell whether a value from a sheet or file can be requested at all
+def is_checkable(url):
+    if not isinstance(url, str):
+        return False
+    parts = urlsplit(url.strip())
+    return parts.scheme in ('http', 'https') and bool(parts.netloc)
+
+
+_EXHAUSTED = object()
+
+
+# Bulk URL status checker: thousands of checks in flight, bounded buffering, round-robin across hosts
+class StatusChecker:
+    def __init__(self, client=None, concurrency=1000, per_host=8, max_buffer=20000,
+                 retries=3, retry_seconds=30, timeout=PAGE_TIMEOUT, policy=None):
+        self.client = client or get_client()
+        self.policy = policy or get_policy()
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.max_buffer = max_buffer
+        self.retries = retries
+        self.retry_seconds = retry_seconds
+        self.timeout = timeout
+        self.stats = collections.Counter()
+
+    async def _request_status(self, session, url):
+        timeout = self.client.client_timeout(self.timeout)
+        async with session.head(url, allow_redirects=True, timeout=timeout) as response:
+            if response.status not in (405, 501):
+                return raise_for_retry(response.status, response.headers.get('Retry-After'))
+        # Some servers reject HEAD; fall back to GET without reading the body
+        async with session.get(url, allow_redirects=True, timeout=timeout) as response:
+            return raise_for_retry(response.status, response.headers.get('Retry-After'))
+
+    # Function to check one URL, retrying transient failures until the retry window closes.
+    # Any failure becomes "Error checking URL" for that row; one bad row never stops the batch.
+    async def check(self, url):
+        if not is_checkable(url):
+            # Numbers, blanks and relative paths from input sheets; no request and no host breaker
+            log_url(logger, logging.WARNING, "Not a checkable URL", str(url))
+            self.stats['invalid'] += 1
+            self.stats[status_label(None)] += 1
+            return url, status_label(None)
+        try:
+            session = await self.client.session()
+            status = await self.policy.call(url, self._request_status, session, url, attempts=self.retries + 1,
+                                            deadline=time.monotonic() + self.retry_seconds)
+        except CircuitOpenError:
+            self.stats['shed'] += 1
+            status = None
+        except RetryableError as e:
+            status = e.status  # still failing after the retries; report what the server said
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = None
+            log_url(logger, logging.WARNING, "Status check failed", url, error=str(e))
+        except Exception as e:
+            status = None
+            log_url(logger, logging.ERROR, "Unexpected error while checking URL", url, error=repr(e))
+        if status is None:
+            log_url(logger, logging.ERROR, "Error occurred while checking URL", url)
+        self.stats[status_label(status)] += 1
+        return url, status_label(status)
+
+    # Function to stream (url, status) results while pulling URLs lazily from any iterable
+    async def iter_statuses(self, urls):
+        source = iter(urls)
+        host_queues = collections.defaultdict(collections.deque)
+        active = collections.Counter()
+        ready, ready_set = collections.deque(), set()
+        in_flight = set()
+        buffered = 0
+        exhausted = False
+
+        def mark_ready(host):
+            if host not in ready_set and host_queues[host] and active[host] < self.per_host:
+                ready.append(host)
+                ready_set.add(host)
+
+        while True:
+            while not exhausted and buffered < self.max_buffer:
+                url = next(source, _EXHAUSTED)
+                if url is _EXHAUSTED:
+                    exhausted = True
+                    break
+                host = urlsplit(url).netloc if is_checkable(url) else None  # invalid rows share a queue
+                host_queues[host].append(url)
+                buffered += 1
+                mark_ready(host)
+
+            while ready and len(in_flight) < self.concurrency:
+                host = ready.popleft()
+                ready_set.discard(host)
+                url = host_queues[host].popleft()
+                buffered -= 1
+                active[host] += 1
+                task = asyncio.create_task(self.check(url))
+                task.host = host
+                in_flight.add(task)
+                mark_ready(host)  # back of the line, so every host gets a turn
+
+            if not in_flight:
+                if exhausted:
+                    return
+                continue
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                active[task.host] -= 1
+                if not host_queues[task.host] and not active[task.host]:
+                    del host_queues[task.host]
+                    del active[task.host]
+                else:
+                    mark_ready(task.host)
+                yield task.result()
+
+    # Function to check every URL and return {url: status}
+    async def check_all(self, urls):
+        progress = ProgressReporter(logger, 'status check')
+        results = {}
+        async for url, status in self.iter_statuses(urls):
+            results[url] = status
+            progress.incr(status)
+        progress.report()
+        return results
+
+
+# Function to check URLs from synchronous code
+def check_urls(urls, **kwargs):
+    async def run():
+        checker = StatusChecker(**kwargs)
+        try:
+            return await checker.check_all(urls)
+        finally:
+            await checker.client.close()
+
+    return asyncio.run(run())
+
+
+# Function to benchmark StatusChecker against the ThreadPoolExecutor + check_404 approach
+async def benchmark(url_count=50000, hosts=50, latency=0.05, workers=10):
+    from aiohttp import web
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+
+    async def handle(request):
+        await asyncio.sleep(latency)
+        return web.Response(status=404 if request.path.endswith('7') else 200)
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    urls = [f"http://127.0.0.{i % hosts + 1}:{port}/page/{i}" for i in range(url_count)]
+
+    def check_404(url):
+        try:
+            return url, "Redirects to 404" if requests.get(url, timeout=10).status_code == 404 else "Pass"
+        except requests.exceptions.RequestException:
+            return url, "Error checking URL"
+
+    # Thread pool baseline over the same URLs
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        await asyncio.gather(*(loop.run_in_executor(executor, check_404, url) for url in urls))
+    thread_seconds = time.perf_counter() - start
+
+    client = HttpClient(limit=1000, limit_per_host=20)
+    checker = StatusChecker(client=client, concurrency=1000, per_host=20)
+    start = time.perf_counter()
+    results = await checker.check_all(urls)
+    async_seconds = time.perf_counter() - start
+    await client.close()
+    await runner.cleanup()
+
+    print(f"ThreadPoolExecutor({workers}): {url_count / thread_seconds:.0f} URLs/s ({thread_seconds:.0f} s for {url_count} URLs)")
+    print(f"StatusChecker: {len(results) / async_seconds:.0f} URLs/s ({async_seconds:.0f} s for {url_count} URLs)")
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
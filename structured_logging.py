@@ -0,0 +1,124 @@
+import atexit
+import collections
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+
+_listener = None
+
+
+# Formatter that renders each record as a single JSON line
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Human-readable console formatter that still shows the URL of per-URL records
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{record.levelname}: {record.getMessage()}"
+        url = (getattr(record, 'fields', None) or {}).get('url')
+        return f"{line} {url}" if url else line
+
+
+# Filter that keeps only a sample of per-URL records so hot loops don't flood the queue
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rate=0.01, error_sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.error_sample_rate = error_sample_rate
+
+    def filter(self, record):
+        if not getattr(record, 'per_url', False):
+            return True
+        rate = self.error_sample_rate if record.levelno >= logging.WARNING else self.sample_rate
+        return rate >= 1.0 or random.random() < rate
+
+
+# Function to route all logging through a queue drained by a background thread
+def setup_logging(log_file='error_log.txt', level=logging.INFO, sample_rate=0.01,
+                  error_sample_rate=1.0, console=True):
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handlers = []
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(JsonFormatter())
+    handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(ConsoleFormatter())
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate, error_sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+# Function to flush pending records and stop the background writer
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+# Function to log a per-URL event; these records are subject to sampling
+def log_url(logger, level, msg, url, **fields):
+    if logger.isEnabledFor(level):
+        fields['url'] = url
+        logger.log(level, msg, extra={'per_url': True, 'fields': fields})
+
+
+# Periodic progress summary that replaces per-URL prints
+class ProgressReporter:
+    def __init__(self, logger, label, interval=5.0):
+        self.logger = logger
+        self.label = label
+        self.interval = interval
+        self.counts = collections.Counter()
+        self._start = time.monotonic()
+        self._last = self._start
+
+    def incr(self, key, n=1):
+        self.counts[key] += n
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self.report(now)
+
+    def report(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._last = now
+        elapsed = max(now - self._start, 1e-9)
+        summary = ', '.join(f"{key}={value}" for key, value in sorted(self.counts.items()))
+        rate = sum(self.counts.values()) / elapsed
+        self.logger.info(f"[{self.label}] {summary} ({elapsed:.0f}s, {rate:.1f} events/s)",
+                         extra={'fields': {'progress': self.label, 'elapsed': round(elapsed, 1),
+                                           **self.counts}})
@@ -0,0 +1,95 @@
+import collections
+import hashlib
+import re
+from urllib.parse import urlparse, parse_qsl
+
+NUMBER_SEGMENT = re.compile(r'^\d+$')
+ID_SEGMENT = re.compile(r'^(?=.*\d)[0-9a-f-]{8,}$', re.IGNORECASE)
+SLUG_SEGMENT = re.compile(r'^[\w%]+(?:[-_.][\w%]+)+$')
+
+SIGNATURE_DEPTH = 4  # levels below <body> that make up the markup signature
+SCORE_COLUMNS = [
+    'Performance Score',
+    'Largest Contentful Paint (seconds)',
+    'Total Blocking Time (seconds)',
+    'Cumulative Layout Shift (CLS)',
+]
+
+
+# Function to reduce a URL to its path pattern, e.g. /blog/{slug} or /product/{n}?page
+def path_pattern(url):
+    parts = urlparse(url)
+    segments = []
+    for segment in parts.path.strip('/').split('/'):
+        if NUMBER_SEGMENT.match(segment):
+            segments.append('{n}')
+        elif ID_SEGMENT.match(segment):
+            segments.append('{id}')
+        elif SLUG_SEGMENT.match(segment):
+            segments.append('{slug}')
+        else:
+            segments.append(segment)
+    pattern = '/' + '/'.join(segments)
+    query_keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    if query_keys:
+        pattern += '?' + '&'.join(query_keys)
+    return pattern
+
+
+# Function to hash the set of (depth, tag, class) shapes near the top of <body>
+def markup_signature(soup, depth=SIGNATURE_DEPTH):
+    body = soup.body or soup
+    shapes = set()
+    level = [child for child in body.find_all(True, recursive=False)]
+    for current_depth in range(depth):
+        next_level = []
+        for element in level:
+            classes = element.get('class') or ['']
+            shapes.add(f"{current_depth}:{element.name}.{sorted(classes)[0]}")
+            next_level.extend(element.find_all(True, recursive=False))
+        level = next_level
+    digest = hashlib.blake2b('|'.join(sorted(shapes)).encode('utf-8'), digest_size=8).digest()
+    return digest.hex()
+
+
+# Groups URLs by path pattern plus markup signature and picks a few representatives per group
+class TemplateSampler:
+    def __init__(self, per_template=3):
+        self.per_template = per_template
+        self.clusters = collections.OrderedDict()  # template key -> member URLs, in input order
+
+    @staticmethod
+    def template_key(url, signature=None):
+        return f"{path_pattern(url)} #{signature}" if signature else path_pattern(url)
+
+    def add(self, url, signature=None):
+        self.clusters.setdefault(self.template_key(url, signature), []).append(url)
+
+    # Function to return representatives, keeping each cluster's first members (input order = priority)
+    def representatives(self):
+        return {url: key for key, members in self.clusters.items() for url in members[:self.per_template]}
+
+    # Function to list pages that were not audited and the template that stands in for them
+    def unsampled(self):
+        return [{'URL': url, 'Template': key, 'Sampled': False}
+                for key, members in self.clusters.items() for url in members[self.per_template:]]
+
+    # Function to summarise audited scores per template
+    def template_report(self, results):
+        import pandas as pd  # only needed when a report is written
+
+        sampled = self.representatives()
+        rows = [dict(result, Template=sampled.get(result['URL'])) for result in results
+                if result.get('URL') in sampled]
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows)
+        columns = [column for column in SCORE_COLUMNS if column in df.columns]
+        report = df.groupby('Template')[columns].describe(percentiles=[0.5, 0.75])
+        report.columns = [f"{column} {stat}" for column, stat in report.columns]
+        sizes = pd.Series({key: len(members) for key, members in self.clusters.items()}, name='Pages')
+        return report.join(sizes, how='left').reset_index()
+
+    def reduction(self):
+        total = sum(len(members) for members in self.clusters.values())
+        return total, len(self.representatives())
@@ -2,130 +2,59 @@ import time
 import requests
 import pandas as pd
 import asyncio
-import aiohttp
-import urllib.parse
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from status_checker import StatusChecker, check_urls
+from http_client import get_client, close_client, PAGE_TIMEOUT
+from pagespeed_client import PageSpeedClient
+from html_fetcher import fetch_html_sync
+from retry_policy import get_policy, raise_for_retry, CircuitOpenError, RetryableError
 from urllib.parse import urlparse, urljoin
+import logging
+from structured_logging import setup_logging, log_url, ProgressReporter
+from excel_export import ExcelWorkbook, save_rows
+
+logger = logging.getLogger(__name__)
 
 # Function to extract links from a webpage
 def extract_links(url, retries=3):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'DNT': '1',
-    }
-    for attempt in range(retries):
-        try:
-            response = requests.get(url, headers=headers, timeout=10, verify=True)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, "html.parser")
-                links = soup.find_all('a', href=True)
-                url_list = [link['href'] for link in links if link['href'].startswith('http')]
-                return url_list
-            else:
-                print(f"Failed to retrieve {url}: Status code {response.status_code}")
-                return []
-        except requests.exceptions.RequestException as e:
-            print(f"Error occurred while fetching {url}: {e}")
-            return []
-
-# Asynchronous function to fetch PageSpeed Insights using Lighthouse with retry logic
-async def fetch_pagespeed_insights_async(url, session, api_key, strategy, semaphore, retries=3):
-    url_encoded = urllib.parse.quote(url, safe=":/")
-    api_url = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url_encoded}&key={api_key}&strategy={strategy}"
-
-    async with semaphore:  # Limit the number of concurrent requests
-        for attempt in range(retries):
-            try:
-                await asyncio.sleep(1)  # Added delay before the request
-                async with session.get(api_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        metrics = extract_metrics(data, url, url_encoded, strategy)
-                        return metrics
-                    elif response.status == 500:
-                        print(f"Error fetching data for {url}: Server error (500). Retrying...")
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                    else:
-                        print(f"Error fetching data for {url}: {response.status}.")
-                        return {'URL': url, 'Status': 'Failed', 'Report Link': api_url}
-            except Exception as e:
-                print(f"Error occurred while fetching data for {url}: {e}. Retrying...")
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
-        print(f"Failed to fetch data for {url} after {retries} attempts.")
-        return {'URL': url, 'Status': 'Failed', 'Report Link': api_url}
-
-# Function to extract relevant metrics from Lighthouse results
-def extract_metrics(data, url, url_encoded, strategy):
-    try:
-        lighthouse_data = data.get('lighthouseResult', {})
-        performance_score = lighthouse_data.get('categories', {}).get('performance', {}).get('score', 0) * 100
-        seo_score = lighthouse_data.get('categories', {}).get('seo', {}).get('score', None)
-        if seo_score is not None:
-            seo_score *= 100
-
-        pwa_score = lighthouse_data.get('categories', {}).get('pwa', {}).get('score', None)
-        if pwa_score is not None:
-            pwa_score *= 100
-
-        core_web_vitals = lighthouse_data.get('audits', {})
-        load_time = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
-        fcp = core_web_vitals.get('first-contentful-paint', {}).get('numericValue', 0) / 1000
-        lcp = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
-        ttb = core_web_vitals.get('total-blocking-time', {}).get('numericValue', 0) / 1000
-        speed_index = core_web_vitals.get('speed-index', {}).get('numericValue', 0) / 1000
-        cls = core_web_vitals.get('cumulative-layout-shift', {}).get('numericValue', 0)
-
-        return {
-            'URL': url,
-            'Performance Score': performance_score,
-            'SEO Score': seo_score,
-            'PWA Score': pwa_score,
-            'Load Time (seconds)': load_time,
-            'First Contentful Paint (seconds)': fcp,
-            'Largest Contentful Paint (seconds)': lcp,
-            'Total Blocking Time (seconds)': ttb,
-            'Speed Index (seconds)': speed_index,
-            'Cumulative Layout Shift (CLS)': cls,
-            'Strategy': strategy,
-            'Status': 'Success'
-        }
-    except KeyError as e:
-        print(f"Error extracting metrics for {url}: {e}")
-        return {'URL': url, 'Status': 'Failed', 'Report Link': url_encoded}
-
-# Function to check if a URL redirects to a 404 page
-def check_404(url):
+    def fetch():
+        result = fetch_html_sync(get_client().sync_session(), url, timeout=PAGE_TIMEOUT)
+        raise_for_retry(result.status)
+        return result
+
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 404:
-            return url, "Redirects to 404"
-        return url, "Pass"
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred while checking {url}: {e}")
-        return url, "Error checking URL"
+        result = get_policy().call_sync(url, fetch, attempts=retries)
+    except CircuitOpenError:
+        log_url(logger, logging.DEBUG, "Host circuit open, skipping page", url)
+        return []
+    except (requests.exceptions.RequestException, RetryableError) as e:
+        log_url(logger, logging.ERROR, "Error occurred while fetching page", url, error=str(e))
+        return []
+
+    if result.html is not None:
+        soup = BeautifulSoup(result.html, "html.parser")
+        links = soup.find_all('a', href=True)
+        url_list = [link['href'] for link in links if link['href'].startswith('http')]
+        return url_list
+    elif result.skipped:
+        log_url(logger, logging.DEBUG, "Skipped non-HTML resource", url, reason=result.skipped)
+    else:
+        log_url(logger, logging.WARNING, "Failed to retrieve page", url, status=result.status)
+    return []
 
 # Optimized URL checking in Excel
-def check_urls_in_excel(input_excel_file, output_excel_file, max_workers=10):  # Reduced max_workers
+def check_urls_in_excel(input_excel_file, output_excel_file, concurrency=1000):
     df = pd.read_excel(input_excel_file)
 
     if 'URL' not in df.columns:
         print("The Excel file does not contain a column named 'URL'.")
         return
     urls = df['URL'].dropna().tolist()
-    result = []
+    result = check_urls(urls, concurrency=concurrency)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(check_404, url) for url in urls]
-        for future in as_completed(futures):
-            url, status = future.result()
-            result.append((url, status))
-
-    df['Status'] = df['URL'].apply(lambda x: dict(result).get(x, "Empty URL"))
-    df.to_excel(output_excel_file, index=False)
+    df['Status'] = df['URL'].apply(lambda x: result.get(x, "Empty URL"))
+    with ExcelWorkbook(output_excel_file) as workbook:
+        workbook.write_frame('Sheet1', df)
     print(f"Results written to {output_excel_file}")
 
 # Function to crawl a website and collect all the URLs
@@ -134,6 +63,7 @@ def crawl_website(start_url, domain, all_urls=None):
         all_urls = set()
 
     to_crawl = [start_url]
+    progress = ProgressReporter(logger, 'crawl')
 
     while to_crawl:
         url = to_crawl.pop(0)
@@ -141,9 +71,11 @@ def crawl_website(start_url, domain, all_urls=None):
         if url in all_urls:
             continue
 
-        print(f"Crawling {url}...")
+        log_url(logger, logging.DEBUG, "Crawling", url)
         links = extract_links(url)
         all_urls.add(url)
+        progress.incr('crawled')
+        progress.incr('queued', len(links))
 
         for link in links:
             full_url = urljoin(url, link)
@@ -152,25 +84,25 @@ def crawl_website(start_url, domain, all_urls=None):
 
         time.sleep(0.5)  # Increased sleep time to slow down crawling speed
 
+    progress.report()
     return all_urls
 
 # Function to save results to an Excel file
 def save_to_excel(urls, output_file):
-    df = pd.DataFrame(list(urls), columns=["URL"])
-    df.to_excel(output_file, index=False, engine='openpyxl')
-    print(f"Saved {len(urls)} URLs to {output_file}")
+    count = save_rows(output_file, ({'URL': url} for url in urls), columns=['URL'])
+    print(f"Saved {count} URLs to {output_file}")
 
 # Function to save PageSpeed Insights results to Excel
 def save_results_to_excel(results, filename):
-    df = pd.DataFrame(results)
-    df.to_excel(filename, index=False)
+    save_rows(filename, results)
     print(f"Saved PageSpeed Insights to {filename}")
 
 # Main function to process crawling, 404 check, and PageSpeed Insights
 async def main():
+    setup_logging()
     start_url = input("Enter the website URL: ")
     domain = urlparse(start_url).netloc
-    api_key = input("Enter your Google PageSpeed API key: ")
+    api_key = input("Enter your Google PageSpeed API key(s), comma-separated: ")
 
     # Step 1: Crawl the website to extract all URLs
     all_urls = crawl_website(start_url, domain)
@@ -178,16 +110,8 @@ async def main():
 
     # Step 2: Check each URL for 404 redirects
     output404_file = 'output404resurrection.xlsx'
-    to_check = all_urls.copy()
-    to_check_404 = []
-
-    # Reduced max_workers for slower 404 checking
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(check_404, url) for url in to_check]
-        for future in as_completed(futures):
-            url, status = future.result()
-            if status == "Redirects to 404":
-                to_check_404.append(url)
+    statuses = await StatusChecker().check_all(all_urls)
+    to_check_404 = {url for url, status in statuses.items() if status == "Redirects to 404"}
 
     if to_check_404:
         save_to_excel(to_check_404, output404_file)
@@ -198,15 +122,13 @@ async def main():
     results = []
 
     if to_check_pagespeed:
-        async with aiohttp.ClientSession() as session:
-            semaphore = asyncio.Semaphore(10)  # Reduced concurrency
-            tasks = []
-            for url in to_check_pagespeed:
-                tasks.append(fetch_pagespeed_insights_async(url, session, api_key, "desktop", semaphore))
-
-            results = await asyncio.gather(*tasks)
+        pagespeed = PageSpeedClient(api_key, strategy="desktop", concurrency=10)  # Reduced concurrency
+        results = await asyncio.gather(*(pagespeed.audit(url) for url in to_check_pagespeed))
+        logger.info(f"PageSpeed stats: {dict(pagespeed.stats)}, keys: {pagespeed.keys.stats()}")
 
     save_results_to_excel(results, output_pagespeed_file)
+    logger.info(f"Retry policy: {get_policy().summary()}")
+    await close_client()
 
 # Run the main function
 if __name__ == "__main__":
@@ -1,212 +1,330 @@
 
+import os
 import time
-import pandas as pd
+import collections
 import asyncio
-import aiohttp
-import urllib.parse
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, urljoin
 from bs4 import BeautifulSoup
 import logging
-
-# Configure logging
-logging.basicConfig(filename='error_log.txt', level=logging.ERROR)
+from structured_logging import setup_logging, log_url, ProgressReporter
+from http_client import get_client, close_client, PAGE_TIMEOUT
+from visited_set import DiskUrlQueue
+from redirects import RedirectResolver
+from audit_scheduler import AuditScheduler, parse_prefix_weights
+from link_graph import LinkGraph
+from crawl_budget import CrawlBudget, parse_patterns, parse_quotas
+from template_sampler import TemplateSampler, markup_signature
+from near_duplicates import NearDuplicateIndex
+from history_store import HistoryStore, regressions, sheet_column, BASELINE_RUNS
+from html_fetcher import fetch_html, fetch_stats, MAX_HTML_BYTES
+from excel_export import ExcelWorkbook, save_rows
+from pagespeed_client import PageSpeedClient
+from driver_cache import chromedriver_path
+from retry_policy import get_policy, raise_for_retry, CircuitOpenError
+
+logger = logging.getLogger(__name__)
 
 # Function to set up Selenium WebDriver
 def get_selenium_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.chrome.options import Options
+
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=chrome_options)
+    driver = webdriver.Chrome(service=ChromeService(chromedriver_path()), options=chrome_options)
     return driver
 
 # Function to extract links from a webpage
-async def extract_links(url, session, retries=3):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    }
-    for attempt in range(retries):
-        try:
-            async with session.get(url, headers=headers, timeout=10) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    soup = BeautifulSoup(content, "html.parser")
-                    links = soup.find_all('a', href=True)
-                    url_list = [link['href'] for link in links if link['href'].startswith('http')]
-                    return url_list
-                else:
-                    logging.error(f"Failed to retrieve {url}: Status code {response.status}")
-                    return []
-        except Exception as e:
-            logging.error(f"Error occurred while fetching {url}: {e}")
-            return []
-
-# Asynchronous function to fetch PageSpeed Insights using the API
-async def fetch_pagespeed_insights_async(url, session, api_key, strategy, semaphore, retries=3):
-    url_encoded = urllib.parse.quote(url, safe=":/")
-    api_url = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url_encoded}&key={api_key}&strategy={strategy}"
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'
-    }
+async def extract_links(url, session, retries=3, graph=None, max_bytes=MAX_HTML_BYTES, dedupe=None):
+    async def fetch():
+        result = await fetch_html(session, url, max_bytes=max_bytes,
+                                  timeout=get_client().client_timeout(PAGE_TIMEOUT))
+        raise_for_retry(result.status)
+        return result
 
-    async with semaphore:
-        for attempt in range(retries):
-            try:
-                await asyncio.sleep(1)  # Reduced delay between requests
-                async with session.get(api_url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        metrics = extract_metrics(data, url)
-                        return metrics
-                    elif response.status in (500, 503):
-                        logging.error(f"Server error for {url} (status {response.status}). Retrying...")
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                    else:
-                        response_text = await response.text()
-                        logging.error(f"Error fetching data for {url}: {response.status} - {response_text}")
-                        return {'URL': url, 'Status': 'Failed', 'Report Link': api_url}
-            except aiohttp.ClientError as e:
-                logging.error(f"Client error while fetching {url}: {e}. Retrying...")
-                await asyncio.sleep(2 ** attempt)
-            except Exception as e:
-                logging.error(f"Unexpected error for {url}: {e}. Retrying...")
-                await asyncio.sleep(2 ** attempt)
-        logging.error(f"Failed to fetch data for {url} after {retries} attempts.")
-        return {'URL': url, 'Status': 'Failed', 'Report Link': api_url}
-
-# Function to extract relevant metrics from the API results
-def extract_metrics(data, url):
-    try:
-        lighthouse_data = data.get('lighthouseResult', {})
-        performance_score = lighthouse_data.get('categories', {}).get('performance', {}).get('score', 0) * 100
-        seo_score = lighthouse_data.get('categories', {}).get('seo', {}).get('score', None)
-        if seo_score is not None:
-            seo_score *= 100
-        pwa_score = lighthouse_data.get('categories', {}).get('pwa', {}).get('score', None)
-        if pwa_score is not None:
-            pwa_score *= 100
-
-        core_web_vitals = lighthouse_data.get('audits', {})
-        load_time = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
-        fcp = core_web_vitals.get('first-contentful-paint', {}).get('numericValue', 0) / 1000
-        lcp = core_web_vitals.get('largest-contentful-paint', {}).get('numericValue', 0) / 1000
-        ttb = core_web_vitals.get('total-blocking-time', {}).get('numericValue', 0) / 1000
-        speed_index = core_web_vitals.get('speed-index', {}).get('numericValue', 0) / 1000
-        cls = core_web_vitals.get('cumulative-layout-shift', {}).get('numericValue', 0)
-
-        return {
-            'URL': url,
-            'Performance Score': performance_score,
-            'SEO Score': seo_score,
-            'PWA Score': pwa_score,
-            'Load Time (seconds)': load_time,
-            'First Contentful Paint (seconds)': fcp,
-            'Largest Contentful Paint (seconds)': lcp,
-            'Total Blocking Time (seconds)': ttb,
-            'Speed Index (seconds)': speed_index,
-            'Cumulative Layout Shift (CLS)': cls,
-            'Status': 'Success'
-        }
-    except KeyError as e:
-        logging.error(f"Error extracting metrics for {url}: {e}")
-        return {'URL': url, 'Status': 'Failed', 'Report Link': url}
-
-# Function to check if a URL redirects to a 404 page
-def check_404(url):
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 404:
-            return url, "Redirects to 404"
-        return url, "Pass"
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error occurred while checking {url}: {e}")
-        return url, "Error checking URL"
+        result = await get_policy().call(url, fetch, attempts=retries)
+    except CircuitOpenError:
+        log_url(logger, logging.DEBUG, "Host circuit open, skipping page", url)
+        return []
+    except Exception as e:
+        log_url(logger, logging.ERROR, "Error occurred while fetching page", url, error=str(e))
+        return []
+
+    if result.html is not None:
+        soup = BeautifulSoup(result.html, "html.parser")
+        if graph is not None:
+            graph.record_template(url, markup_signature(soup))
+        if dedupe is not None:
+            canonical_url = dedupe.add(url, soup)
+            if canonical_url is not None:
+                # Same content as a page already expanded; its links were queued from there
+                log_url(logger, logging.DEBUG, "Near-duplicate page, not expanding", url, canonical=canonical_url)
+                return []
+        links = soup.find_all('a', href=True)
+        url_list = [link['href'] for link in links if link['href'].startswith('http')]
+        return url_list
+    elif result.skipped:
+        log_url(logger, logging.DEBUG, "Skipped non-HTML resource", url, reason=result.skipped)
+    else:
+        log_url(logger, logging.WARNING, "Failed to retrieve page", url, status=result.status)
+    return []
 
 # Asynchronous function to crawl a website and collect all the URLs
-async def crawl_website(start_url, domain, api_key, semaphore_pagespeed):
-    all_urls = set()
-    to_crawl = [start_url]
-
-    async with aiohttp.ClientSession() as session:
-        while to_crawl:
-            url = to_crawl.pop(0)
-
-            if url in all_urls:
+async def crawl_website(start_url, domain, results_file='crawled_urls.txt', graph=None, budget=None,
+                        max_html_bytes=MAX_HTML_BYTES, dedupe=None):
+    # The link graph doubles as the visited set; only URLs admitted by the budget enter it
+    to_crawl = DiskUrlQueue()
+    all_urls = DiskUrlQueue(results_file)
+    graph = graph if graph is not None else LinkGraph()
+    budget = budget if budget is not None else CrawlBudget()
+    progress = ProgressReporter(logger, f'crawl {domain}')
+
+    to_crawl.push(start_url)
+    graph.record_depth(start_url, 0)
+    session = await get_client().session()
+    while to_crawl and not budget.exhausted():
+        url = to_crawl.pop()
+        depth = graph.depth(url)
+
+        log_url(logger, logging.DEBUG, "Crawling", url)
+        links = await extract_links(url, session, graph=graph, max_bytes=max_html_bytes, dedupe=dedupe)
+        all_urls.push(url)
+        budget.record_fetch()
+        progress.incr('crawled')
+        progress.incr('queued', len(links))
+
+        for full_url in dict.fromkeys(urljoin(url, link) for link in links):
+            if domain not in urlparse(full_url).netloc:
                 continue
-
-            print(f"Crawling {url}...")
-            links = await extract_links(url, session)
-            all_urls.add(url)
-
-            # Start fetching PageSpeed Insights for the crawled URL
-            asyncio.create_task(fetch_pagespeed_insights_async(url, session, api_key, "desktop", semaphore_pagespeed))
-
-            for link in links:
-                full_url = urljoin(url, link)
-                if domain in urlparse(full_url).netloc and full_url not in all_urls:
-                    to_crawl.append(full_url)
-
-            await asyncio.sleep(0.1)  # Control the crawling speed
-
+            if graph.visited(full_url):
+                graph.record_link(url, full_url)
+            elif budget.allows(full_url, depth + 1):
+                graph.record_depth(full_url, depth + 1)
+                graph.record_link(url, full_url)
+                to_crawl.push(full_url)
+
+        await asyncio.sleep(0.1)  # Control the crawling speed
+
+    if to_crawl:
+        logger.warning(f"Crawl stopped early ({budget.stop_reason}); {len(to_crawl)} queued URLs were not fetched")
+    to_crawl.close()
+    progress.report()
+    logger.info(f"Crawl budget: {budget.summary()}")
+    logger.info(f"HTML fetch stats: {dict(fetch_stats)}")
+    if dedupe is not None:
+        logger.info(f"Near-duplicate detection: {dict(dedupe.stats)}")
+    logger.info(f"Link graph: {len(graph)} URLs, {graph.edge_count} links")
     return all_urls
 
 # Function to save results to an Excel file
 def save_to_excel(urls, output_file):
-    df = pd.DataFrame(list(urls), columns=["URL"])
-    df.to_excel(output_file, index=False)
-    print(f"Saved {len(urls)} URLs to {output_file}")
+    count = save_rows(output_file, ({'URL': url} for url in urls), columns=['URL'])
+    print(f"Saved {count} URLs to {output_file}")
 
 # Function to save PageSpeed Insights results to Excel
 def save_results_to_excel(results, filename):
-    df = pd.DataFrame(results)
-    df.to_excel(filename, index=False)
+    save_rows(filename, results)
     print(f"Saved PageSpeed Insights to {filename}")
 
-# Main function to process crawling, 404 check, and PageSpeed Insights
-async def main():
-    start_url = input("Enter the website URL: ")
+# Per-site settings; the interactive prompts and the batch runner both fill these in
+SITE_DEFAULTS = {
+    'api_key': None,
+    'strategy': 'desktop',
+    'output_dir': '.',
+    'prefix_weights': {},
+    'max_audits': None,
+    'audit_minutes': None,
+    'per_template': None,
+    'max_depth': None,
+    'max_pages': None,
+    'crawl_minutes': None,
+    'prefix_quotas': {},
+    'include': [],
+    'exclude': [],
+    'max_html_bytes': MAX_HTML_BYTES,
+    'dedupe_distance': 6,  # simhash bits; None crawls, checks and audits every near-duplicate
+    'history_db': 'audit_history.sqlite',  # relative to output_dir; None keeps no history
+    'known_urls': None,  # e.g. sitemap or input-sheet URLs; those no crawled page links to are orphans
+}
+
+# Function to run crawling, 404 check, and PageSpeed Insights for one site
+async def run_site(start_url, settings, semaphore_pagespeed=None, resolver=None, pagespeed=None):
+    settings = dict(SITE_DEFAULTS, **settings)
     domain = urlparse(start_url).netloc
-    api_key = input("Enter your Google PageSpeed API key: ")
+    output_dir = settings['output_dir']
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore_pagespeed = semaphore_pagespeed or asyncio.Semaphore(10)  # Control concurrency for PageSpeed requests
+    resolver = resolver or RedirectResolver()
+    pagespeed = pagespeed or PageSpeedClient(settings['api_key'], strategy=settings['strategy'],
+                                             semaphore=semaphore_pagespeed)
 
     # Step 1: Crawl the website to extract all URLs
-    semaphore_pagespeed = asyncio.Semaphore(10)  # Control concurrency for PageSpeed requests
-    all_urls = await crawl_website(start_url, domain, api_key, semaphore_pagespeed)
+    graph = LinkGraph()
+    graph.add_known(settings['known_urls'] or [])
+    dedupe = NearDuplicateIndex(settings['dedupe_distance']) if settings['dedupe_distance'] is not None else None
+    budget = CrawlBudget(max_depth=settings['max_depth'], max_pages=settings['max_pages'],
+                         prefix_quotas=settings['prefix_quotas'],
+                         include=settings['include'], exclude=settings['exclude'],
+                         deadline_seconds=settings['crawl_minutes'] * 60 if settings['crawl_minutes'] else None)
+    all_urls = await crawl_website(start_url, domain, os.path.join(output_dir, 'crawled_urls.txt'),
+                                   graph=graph, budget=budget, max_html_bytes=settings['max_html_bytes'],
+                                   dedupe=dedupe)
+    graph.save(os.path.join(output_dir, 'link_graph.bin'))
+    logger.info(f"Link graph for {domain}: {len(graph)} pages, {graph.edge_count} links")
+    orphans = graph.orphans() if settings['known_urls'] else None
+    if orphans:
+        logger.info(f"{len(orphans)} of {len(settings['known_urls'])} known URLs are not linked from any crawled page")
 
     print(f"Extracted {len(all_urls)} URLs from {start_url}.")
 
-    # Step 2: Check each URL for 404 redirects
-    output404_file = 'output404resurrection.xlsx'
-    to_check = all_urls.copy()
+    # Crawl, 404 and audit results go into separate sheets of one streamed workbook
+    report_file = os.path.join(output_dir, 'site_report.xlsx')
+    workbook = ExcelWorkbook(report_file)
+    workbook.write_sheet('Crawl', ({
+        'URL': url,
+        'Click Depth': graph.depth(url),
+        'Inlinks': graph.inlinks(url),
+        'Template': graph.template(url),
+        'Duplicate Of': dedupe.duplicate_of[url][0] if dedupe is not None and dedupe.is_duplicate(url) else None,
+    } for url in all_urls), columns=['URL', 'Click Depth', 'Inlinks', 'Template', 'Duplicate Of'])
+
+    if orphans is not None:
+        workbook.write_sheet('Orphans', ({'URL': url} for url in orphans), columns=['URL'])
+
+    # Near-duplicates share their canonical page's content, so a duplicate that lands on itself is
+    # not audited on its own; redirect aliases were fetched as their target page during the crawl
+    # and look like duplicates, so redirects are resolved for every URL before any are dropped
+    duplicate_groups = dedupe.groups() if dedupe is not None else {}
+    if dedupe is not None:
+        workbook.write_sheet('Duplicates', dedupe.report(), columns=['Group', 'Canonical URL', 'URL', 'Distance (bits)'])
+
+    # Step 2: Resolve each URL's redirect chain as it streams off disk; only 404 rows and the
+    # landing page -> requested URLs map are kept
     to_check_404 = []
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(check_404, url) for url in to_check]
-        for future in as_completed(futures):
-            url, status = future.result()
-            if status == "Redirects to 404":
-                to_check_404.append(url)
-
-    if to_check_404:
-        save_to_excel(to_check_404, output404_file)
-
-    # Step 3: Fetch PageSpeed Insights for non-404 URLs
-    output_pagespeed_file = 'outputspeed_introspection.xlsx'
-    to_check_pagespeed = [url for url in all_urls if url not in to_check_404]
+    to_check_pagespeed = collections.OrderedDict()
+    duplicate_pages = []
+    async for row in resolver.iter_resolved(all_urls):
+        if row['Status'] == "Redirects to 404":
+            row['Inlinks'] = graph.inlinks(row['URL'])
+            row['Click Depth'] = graph.depth(row['URL'])
+            row['Linked From'] = '\n'.join(graph.linked_from(row['URL'], limit=50))
+            to_check_404.append(row)
+        elif row['Status'] == "Pass":
+            if dedupe is not None and dedupe.is_duplicate(row['URL']) and not row['Hops']:
+                duplicate_pages.append(row['URL'])
+            else:
+                to_check_pagespeed.setdefault(row['Final URL'], []).append(row['URL'])
+    # A duplicate page that a kept URL redirects to is still audited, as that URL's landing page
+    for url in duplicate_pages:
+        if url in to_check_pagespeed:
+            to_check_pagespeed[url].append(url)
+    logger.info(f"Redirect resolver stats: {dict(resolver.stats)}")
+
+    workbook.write_sheet('404', to_check_404, columns=[
+        'URL', 'Final URL', 'Final Status', 'Hops', 'Redirect Chain', 'Status', 'Inlinks', 'Click Depth', 'Linked From'])
+
+    # Step 3: Fetch PageSpeed Insights once per resolved landing page, most valuable pages first
     results = []
+    sampler = None
 
     if to_check_pagespeed:
-        async with aiohttp.ClientSession() as session:
-            tasks = [fetch_pagespeed_insights_async(url, session, api_key, "desktop", semaphore_pagespeed) for url in to_check_pagespeed]
-            results = await asyncio.gather(*tasks)
+        to_audit = to_check_pagespeed
+        if settings['per_template']:
+            sampler = TemplateSampler(settings['per_template'])
+            for final_url, aliases in to_check_pagespeed.items():
+                signatures = [graph.template(page) for page in [final_url] + aliases]
+                sampler.add(final_url, next((sig for sig in signatures if sig), None))
+            to_audit = sampler.representatives()
+            total, sampled = sampler.reduction()
+            logger.info(f"Template sampling: auditing {sampled} of {total} pages across {len(sampler.clusters)} templates")
+
+        scheduler = AuditScheduler(settings['prefix_weights'], max_calls=settings['max_audits'],
+                                   max_seconds=settings['audit_minutes'] * 60 if settings['audit_minutes'] else None)
+        for final_url in to_audit:
+            pages = {final_url, *to_check_pagespeed[final_url]}
+            depths = [d for d in (graph.depth(page) for page in pages) if d is not None]
+            scheduler.add(final_url, min(depths) if depths else None, sum(graph.inlinks(page) for page in pages))
+
+        results = await scheduler.run(lambda url: pagespeed.audit(url, settings['strategy']))
+        logger.info(f"PageSpeed stats: {dict(pagespeed.stats)}, keys: {pagespeed.keys.stats()}")
+        for result in results:
+            result['Requested URLs'] = ', '.join(to_check_pagespeed.get(result['URL'], []))
+            result['Near-Duplicate URLs'] = sum(len(duplicate_groups.get(page, ()))
+                                                for page in {result['URL'], *to_check_pagespeed.get(result['URL'], [])})
+
+    if sampler is not None:
+        templates = sampler.representatives()
+        for result in results:
+            result['Template'] = templates.get(result['URL'])
+            # Representatives the audit budget never reached were chosen but not measured
+            result['Sampled'] = not str(result.get('Status', '')).startswith('Skipped')
+        template_report = sampler.template_report([r for r in results if r.get('Status') == 'Success'])
+        workbook.write_frame('Templates', template_report)
+        results = list(results) + sampler.unsampled()
+
+    workbook.write_sheet('Audit', results)
+
+    # Step 4: Append this run to the audit history and flag pages that got slower than their baseline
+    flagged = None
+    if settings['history_db'] and any(result.get('Status') == 'Success' for result in results):
+        history = HistoryStore(os.path.join(output_dir, settings['history_db']))
+        try:
+            history.append(start_url, settings['strategy'], results)
+            report = regressions(history.load(site=start_url, strategy=settings['strategy'],
+                                              last_runs=BASELINE_RUNS + 1))
+        finally:
+            history.close()
+        flagged = len(report)
+        if flagged:
+            workbook.write_frame('Regressions', report.rename(columns=sheet_column))
+            logger.info(f"{flagged} metric regressions against the last {BASELINE_RUNS} runs of {start_url}")
+
+    workbook.save()
+    print(f"Saved {workbook.row_counts['Crawl']} crawled URLs, {len(to_check_404)} 404 redirect chains "
+          f"and {len(results)} audit rows to {report_file}")
+    return {
+        'Site': start_url,
+        'Pages Crawled': len(all_urls),
+        'Crawl Stop Reason': budget.stop_reason or 'frontier empty',
+        '404 Pages': len(to_check_404),
+        'Orphan Pages': len(orphans) if orphans is not None else None,
+        'Near Duplicates': len(dedupe.duplicate_of) if dedupe is not None else None,
+        'Audited': sum(1 for result in results if result.get('Status') == 'Success'),
+        'Regressions': flagged,
+        'Output Directory': output_dir,
+    }
+
+# Function to read an optional number from a prompt
+def input_number(prompt, cast=int):
+    value = input(prompt).strip()
+    return cast(value) if value else None
+
+# Main function to process crawling, 404 check, and PageSpeed Insights
+async def main():
+    setup_logging()
+    start_url = input("Enter the website URL: ")
+    settings = {
+        'api_key': input("Enter your Google PageSpeed API key(s), comma-separated: "),
+        'prefix_weights': parse_prefix_weights(input("Enter URL-prefix weights, e.g. /blog=2,/tag=0.5 (blank for none): ")),
+        'max_audits': input_number("Enter the maximum number of PageSpeed audits (blank for no limit): "),
+        'audit_minutes': input_number("Enter the audit time budget in minutes (blank for no limit): ", float),
+        'per_template': input_number("Audit only N pages per template (blank to audit every page): "),
+        'max_depth': input_number("Enter the maximum crawl depth (blank for no limit): "),
+        'max_pages': input_number("Enter the maximum number of pages to crawl (blank for no limit): "),
+        'crawl_minutes': input_number("Enter the crawl time limit in minutes (blank for no limit): ", float),
+        'prefix_quotas': parse_quotas(input("Enter per-prefix page quotas, e.g. /blog/tag=200 (blank for none): ")),
+        'include': parse_patterns(input("Enter URL patterns to include, comma-separated regexes (blank for all): ")),
+        'exclude': parse_patterns(input("Enter URL patterns to exclude, comma-separated regexes (blank for none): ")),
+    }
 
-    save_results_to_excel(results, output_pagespeed_file)
+    await run_site(start_url, settings)
+    logger.info(f"HTTP pool stats: {get_client().pool_stats()}")
+    logger.info(f"Retry policy: {get_policy().summary()}")
+    await close_client()
 
 # Run the main function
 if __name__ == "__main__":